@@ -3,7 +3,7 @@
 #
 # SPDX-License-Identifier: LicenseRef-MIT-TQ
 
-files=$(git ls-files -- . ':!:*.patch' | xargs grep --files-with-matches --binary-files=without-match '[[:blank:]]$')
+files=$(git ls-files -- . ':!:*.patch' ':!:tests/packaging/golden/*' | xargs grep --files-with-matches --binary-files=without-match '[[:blank:]]$')
 if [[ -n "$files" ]];then
   echo '  Files with trailing whitespace found:'
   for f in "${files[@]}"; do
@@ -43,30 +43,188 @@
 # filter-pipeline.py --pipeline .buildkite/pipeline-raw.yml \
 #   --git-diff "$(git diff --name-only origin/master...HEAD)" \
 #   --output .buildkite/pipeline.yml
+#
+# The 'only_changes' regexes of all the steps are compiled once and indexed by the
+# literal prefix of their matches, so that each changed file is only matched against
+# the regexes that can match it, which keeps the filtering fast for large diffs.
+#
+# Optional arguments:
+# '--explain' prints for each step the changed file and the dependency edge it runs
+#   because of, or that it's skipped.
+# '--cache-dir' caches the parsed pipeline and the closures of its steps graph under
+#   the hash of the pipeline file, so that filtering the same pipeline for many
+#   commits, e.g. in a bisect, doesn't parse and walk it again. The cache is pickled
+#   rather than stored as JSON since YAML anchors are kept as shared objects.
 
-import argparse, re
+import argparse, hashlib, os, pickle, re
+from collections import deque
 
 from yaml import FullLoader, load, dump
 
+# Bumped whenever the format of the cached pipelines changes
+cache_version = 1
+
+# Characters that end the literal prefix of a regex
+regex_special_chars = set(".^$*+?{}[]()|")
+
+
+def literal_prefix(regex):
+    """
+    Return the literal text that all the matches of the regex start with,
+    e.g. 'docker/package/' for 'docker/package/.*'.
+    """
+    # an alternation may be at the top level, in which case there's no common prefix
+    if "|" in regex:
+        return ""
+    prefix = []
+    i = 0
+    while i < len(regex):
+        c = regex[i]
+        if c == "\\":
+            # only escaped punctuation is literal, '\\d' and the like are classes
+            if i + 1 == len(regex) or regex[i + 1].isalnum():
+                break
+            c = regex[i + 1]
+            i += 2
+        elif c in regex_special_chars:
+            break
+        else:
+            i += 1
+        prefix.append(c)
+    # the last character may be repeated zero times
+    if prefix and i < len(regex) and regex[i] in "*?{":
+        prefix.pop()
+    return "".join(prefix)
+
+
+class ChangesMatcher:
+    """
+    The 'only_changes' regexes of all the steps, compiled once and stored in a trie
+    keyed by their literal prefixes.
+    """
+
+    def __init__(self, steps_regexes):
+        # the same regexes are shared by many steps, so each one is only matched once
+        self.regex_labels = {}
+        for label, regexes in steps_regexes.items():
+            for regex in regexes:
+                self.regex_labels.setdefault(regex, []).append(label)
+        self.compiled = {regex: re.compile(regex) for regex in self.regex_labels}
+        # each node is a dict of its children by character, with the regexes whose
+        # prefix ends at this node under the '' key
+        self.trie = {}
+        for regex in self.regex_labels:
+            node = self.trie
+            for c in literal_prefix(regex):
+                node = node.setdefault(c, {})
+            node.setdefault("", []).append(regex)
+
+    def candidates(self, path):
+        """
+        Yield the regexes whose literal prefix is a prefix of the path.
+        """
+        node = self.trie
+        yield from node.get("", [])
+        for c in path:
+            node = node.get(c)
+            if node is None:
+                return
+            yield from node.get("", [])
+
+    def match(self, diff):
+        """
+        Return the labels of the steps with a regex matching one of the changed files,
+        each mapped to the first such file.
+        """
+        matched = {}
+        pending = set(self.compiled)
+        for diff_file in diff:
+            if not pending:
+                break
+            for regex in list(self.candidates(diff_file)):
+                if regex in pending and self.compiled[regex].match(diff_file):
+                    pending.discard(regex)
+                    for label in self.regex_labels[regex]:
+                        matched.setdefault(label, diff_file)
+        return matched
+
+
+class StepGraph:
+    """
+    Dependencies between the steps, along with the steps reachable from each one
+    in both directions as bitmasks over the steps, so that the closure of any set
+    of steps is only a union of these.
+    """
+
+    def __init__(self, labels, edges, reachable=None):
+        self.labels = labels
+        self.index = {label: i for i, label in enumerate(labels)}
+        self.edges = edges
+        if reachable is None:
+            reachable = {
+                direction: self.compute_reachable(direction) for direction in edges
+            }
+        self.reachable = reachable
 
-def check_step(step, diff):
-    changes_regexes = step.pop("only_changes", None)
-    if changes_regexes is None:
-        return True
-    else:
-        for regex in changes_regexes:
-            r = re.compile(regex)
-            for diff_file in diff:
-                if r.match(diff_file) is not None:
-                    return True
-        return False
+    def compute_reachable(self, direction):
+        """
+        Return the bitmask of the steps reachable from each step, itself included.
+        """
+        edges = self.edges[direction]
+        memo = {}
+        for label in self.labels:
+            # iterative post-order traversal, so that deep pipelines don't hit the
+            # recursion limit, a step is resolved once all the adjacent ones are
+            in_progress = set()
+            stack = [label]
+            while stack:
+                current = stack[-1]
+                if current in memo:
+                    stack.pop()
+                elif current not in in_progress:
+                    in_progress.add(current)
+                    for adjacent in edges.get(current, []):
+                        if adjacent in in_progress:
+                            raise Exception(
+                                f"Dependency cycle through step '{adjacent}'"
+                            )
+                        if adjacent not in memo:
+                            stack.append(adjacent)
+                else:
+                    mask = 1 << self.index[current]
+                    for adjacent in edges.get(current, []):
+                        mask |= memo[adjacent]
+                    memo[current] = mask
+                    in_progress.discard(current)
+                    stack.pop()
+        return [memo[label] for label in self.labels]
 
+    def closure(self, names, direction):
+        """
+        Return the steps reachable from the given ones following the edges in the
+        given direction, including the steps themselves.
+        """
+        reachable = self.reachable[direction]
+        mask = 0
+        for name in names:
+            mask |= reachable[self.index[name]]
+        return {label for i, label in enumerate(self.labels) if mask >> i & 1}
 
-def dfs(name, depends_on_dict, visited):
-    if name not in visited:
-        visited.add(name)
-        for adjacent in depends_on_dict.get(name, []):
-            dfs(adjacent, depends_on_dict, visited)
+    def predecessors(self, names, direction):
+        """
+        Return the step each step reachable from the given ones is first reached
+        from, with None for the given steps.
+        """
+        edges = self.edges[direction]
+        predecessors = {name: None for name in names}
+        queue = deque(predecessors)
+        while queue:
+            current = queue.popleft()
+            for adjacent in edges.get(current, []):
+                if adjacent not in predecessors:
+                    predecessors[adjacent] = current
+                    queue.append(adjacent)
+        return predecessors
 
 
 # Buildkite uses 'key' attribute to determine dependencies of steps.
@@ -106,35 +264,160 @@ def build_tree(steps, key_to_label):
     return depends_on_dict, depends_on_dict_rev
 
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--pipeline", required=True)
-parser.add_argument("--git-diff", required=True)
-parser.add_argument("--output", required=True)
-args = parser.parse_args()
+def prepare_pipeline(pipeline):
+    """
+    Take the 'only_changes' attributes out of the steps and build their graph,
+    which only depends on the pipeline and not on the changes.
+    """
+    steps = [step for step in pipeline["steps"] if isinstance(step, dict)]
+    steps_regexes = {}
+    for step in steps:
+        regexes = step.pop("only_changes", None)
+        if regexes is not None:
+            steps_regexes[step["label"]] = regexes
+    depends_on_dict, depends_on_dict_rev = build_tree(steps, build_key_to_label(steps))
+    graph = StepGraph(
+        list(dict.fromkeys(step["label"] for step in steps)),
+        {"dependents": depends_on_dict, "dependencies": depends_on_dict_rev},
+    )
+    return {
+        "pipeline": pipeline,
+        "steps_regexes": steps_regexes,
+        "labels": graph.labels,
+        "edges": graph.edges,
+        "reachable": graph.reachable,
+    }
 
-splitted_diff = args.git_diff.strip().split("\n")
-pipeline = load(open(args.pipeline, "r"), Loader=FullLoader)
 
-visited = set()
-visited_rev = set()
+def load_prepared_pipeline(path, cache_dir=None):
+    """
+    Load and prepare the pipeline, reusing the result of a previous run on the same
+    pipeline file from 'cache_dir' if there is one.
+    """
+    with open(path, "rb") as f:
+        contents = f.read()
+    cache_path = None
+    if cache_dir is not None:
+        digest = hashlib.sha256(contents).hexdigest()
+        cache_path = os.path.join(
+            cache_dir, f"filter-pipeline-v{cache_version}-{digest}.pickle"
+        )
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                return pickle.load(f)
+    prepared = prepare_pipeline(load(contents, Loader=FullLoader))
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(prepared, f)
+        os.replace(tmp_path, cache_path)
+    return prepared
 
-steps = pipeline["steps"]
-dict_steps = list(filter(lambda x: isinstance(x, dict), steps))
-key_to_label = build_key_to_label(dict_steps)
-depends_on_dict, depends_on_dict_rev = build_tree(dict_steps, key_to_label)
-for step in dict_steps:
-    if check_step(step, splitted_diff):
-        label = step["label"]
-        dfs(label, depends_on_dict, visited)
-        dfs(label, depends_on_dict_rev, visited_rev)
 
-for name in visited:
-    dfs(name, depends_on_dict_rev, visited_rev)
+def filter_prepared_pipeline(prepared, diff, explain=False):
+    """
+    Return the labels of the steps to run for the given changed files, printing
+    the reason each of them runs for if 'explain' is set.
+    """
+    steps_regexes = prepared["steps_regexes"]
+    graph = StepGraph(prepared["labels"], prepared["edges"], prepared["reachable"])
+    matched = ChangesMatcher(steps_regexes).match(diff)
+    # the steps without 'only_changes' always run
+    causes = {
+        label: f"changed file '{matched[label]}'" if label in matched else None
+        for label in graph.labels
+        if label in matched or label not in steps_regexes
+    }
+    # the steps depending on the triggered ones run to use the updated dependencies,
+    # and all of these need the steps they depend on
+    dependents = graph.closure(causes, "dependents")
+    triggered = graph.closure(dependents, "dependencies")
+    if explain:
+        explain_steps(graph, causes, dependents, triggered)
+    return triggered
+
+
+def explain_steps(graph, causes, dependents, triggered):
+    """
+    Print for each step why it runs: the dependency edge it's reached through and
+    the change that triggered the step at the start of the path.
+    """
+    # the searches start from the steps in the pipeline order, rather than from the
+    # 'dependents' set, so that the reported edges don't depend on the hash seed
+    dependents_predecessors = graph.predecessors(causes, "dependents")
+    dependencies_predecessors = graph.predecessors(
+        [label for label in graph.labels if label in dependents], "dependencies"
+    )
+
+    def cause(label):
+        while dependencies_predecessors.get(label) is not None:
+            label = dependencies_predecessors[label]
+        while dependents_predecessors.get(label) is not None:
+            label = dependents_predecessors[label]
+        return causes[label] or f"'{label}' having no 'only_changes'"
+
+    for label in graph.labels:
+        if label not in triggered:
+            print(f"Skipping '{label}': no changes")
+        elif label in causes:
+            reason = (
+                f"{causes[label]} matches its 'only_changes'"
+                if causes[label]
+                else "it has no 'only_changes'"
+            )
+            print(f"Running '{label}': {reason}")
+        elif label in dependents:
+            predecessor = dependents_predecessors[label]
+            print(
+                f"Running '{label}': depends on '{predecessor}', "
+                f"which runs due to {cause(predecessor)}"
+            )
+        else:
+            successor = dependencies_predecessors[label]
+            print(
+                f"Running '{label}': needed by '{successor}', "
+                f"which runs due to {cause(successor)}"
+            )
+
+
+def triggered_steps(steps, diff):
+    """
+    Return the labels of the steps to run for the given changed files.
+    The 'only_changes' attributes are removed from the steps.
+    """
+    return filter_prepared_pipeline(prepare_pipeline({"steps": steps}), diff)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pipeline", required=True)
+    parser.add_argument("--git-diff", required=True)
+    parser.add_argument("--output", required=True)
+    parser.add_argument(
+        "--explain",
+        help="print the changed file and the dependencies each step runs because of",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="directory to cache the steps graph of the pipeline in, "
+        "it's reused while the pipeline file doesn't change",
+    )
+    args = parser.parse_args()
+
+    splitted_diff = args.git_diff.strip().split("\n")
+    prepared = load_prepared_pipeline(args.pipeline, args.cache_dir)
+    triggered = filter_prepared_pipeline(prepared, splitted_diff, args.explain)
+
+    pipeline = prepared["pipeline"]
+    for step in pipeline["steps"]:
+        if isinstance(step, dict) and step["label"] not in triggered:
+            step["skip"] = "skipped due to lack of changes"
+
+    with open(args.output, "w") as f:
+        dump(pipeline, f)
 
-for step in dict_steps:
-    label = step["label"]
-    if (label not in visited) and (label not in visited_rev):
-        step["skip"] = "skipped due to lack of changes"
 
-with open(args.output, "w") as f:
-    dump(pipeline, f)
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,6 @@
 # SPDX-License-Identifier: LicenseRef-MIT-OA
 
 import re
-import json
-import urllib.request
 
 from abc import abstractmethod
 from dataclasses import dataclass
@@ -183,6 +181,9 @@ class Marigold(Provider):
         )
 
     def get_snapshot_metadata(self, network, history_mode, region=None):
+        import json
+        import urllib.request
+
         snapshot_array = None
         with urllib.request.urlopen(self.metadata_url) as url:
             snapshot_array = json.load(url)["data"]
@@ -192,29 +193,16 @@ class Marigold(Provider):
 
 class TzInit(Provider):
     def get_filesize(self, url):
-        request = urllib.request.Request(
-            url, headers=http_request_headers, method="HEAD"
-        )
-        content_length = next(
-            (
-                header[1]
-                for header in urllib.request.urlopen(request).info()._headers
-                if header[0] == "Content-Length"
-            ),
-            None,
-        )
-        if content_length is not None:
-            suffixes = ["B", "KB", "MB", "GB", "TB", "PB"]
-            nbytes = int(content_length)
-            i = 0
-            while nbytes >= 1024 and i < len(suffixes) - 1:
-                nbytes /= 1024.0
-                i += 1
-            f = ("%.2f" % nbytes).rstrip("0").rstrip(".")
-            return "%s%s" % (f, suffixes[i])
-        return content_length
+        # the probe is memoized, so the download step won't repeat it
+        size = probe_url(url).size
+        if size is not None:
+            return human_readable_size(size)
+        return None
 
     def get_snapshot_metadata(self, network, history_mode, region=None):
+        import json
+        import urllib.request
+
         region = "eu" if region is None else region
         history_mode = "full" if history_mode == "archive" else history_mode
         self.metadata_url = f"https://snapshots.{region}.tzinit.org/{network}/{history_mode}.json"
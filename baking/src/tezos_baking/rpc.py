@@ -0,0 +1,99 @@
+# SPDX-FileCopyrightText: 2024 Oxhead Alpha
+# SPDX-License-Identifier: LicenseRef-MIT-OA
+
+"""
+Contains a minimal client for the Tezos node RPC with pooled keep-alive connections
+"""
+
+import http.client
+import json
+import threading
+from urllib.parse import urlparse
+
+from tezos_baking.util import http_request_headers
+
+
+class RpcError(Exception):
+    "Raised when the node RPC is unreachable or returns an error."
+
+
+class RpcClient:
+    def __init__(self, endpoint, timeout=10, max_connections=4):
+        if "://" not in endpoint:
+            endpoint = "http://" + endpoint
+        url = urlparse(endpoint)
+        self.endpoint = endpoint
+        self.scheme = url.scheme
+        self.netloc = url.netloc
+        self.base_path = url.path.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.idle_connections = []
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_connections)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def new_connection(self):
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(self.netloc, timeout=self.timeout)
+
+    def request(self, conn, path):
+        conn.request(
+            "GET",
+            f"{self.base_path}/{path.lstrip('/')}",
+            headers={**http_request_headers, "Accept": "application/json"},
+        )
+        response = conn.getresponse()
+        return response.status, response.read()
+
+    def get(self, path):
+        with self.slots:
+            with self.lock:
+                conn = self.idle_connections.pop() if self.idle_connections else None
+            reused = conn is not None
+            if conn is None:
+                conn = self.new_connection()
+            try:
+                try:
+                    status, body = self.request(conn, path)
+                except (http.client.HTTPException, OSError):
+                    conn.close()
+                    if not reused:
+                        raise
+                    # the node might have closed an idle keep-alive connection
+                    conn = self.new_connection()
+                    status, body = self.request(conn, path)
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                raise RpcError(f"{self.endpoint}/{path}: {e}")
+            with self.lock:
+                self.idle_connections.append(conn)
+        if status != 200:
+            raise RpcError(
+                f"{self.endpoint}/{path}: {status} {body.decode(errors='replace')}"
+            )
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            raise RpcError(f"{self.endpoint}/{path}: {e}")
+
+    # Performs the requests concurrently, returning the results in the same order
+    def get_many(self, paths):
+        from concurrent.futures import ThreadPoolExecutor
+
+        if not paths:
+            return []
+        with ThreadPoolExecutor(min(len(paths), self.max_connections)) as executor:
+            return list(executor.map(self.get, paths))
+
+    def close(self):
+        with self.lock:
+            for conn in self.idle_connections:
+                conn.close()
+            self.idle_connections = []
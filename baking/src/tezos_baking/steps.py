@@ -5,10 +5,6 @@
 Contains step class definition along with the common steps shared between wizards
 """
 
-from dataclasses import dataclass, field
-import textwrap
-import sys
-
 from tezos_baking.util import *
 from tezos_baking.validators import Validator
 import tezos_baking.validators as validators
@@ -74,6 +70,8 @@ class Step:
                         print(str_format.format(i, o))
                     i += 1
         elif self.options and isinstance(self.options, dict):
+            import textwrap
+
             index_len = len(str(len(self.options)))
             max_option_len = max(map(len, self.options.keys()))
             padding = max(26, max_option_len + 2)
@@ -8,19 +8,14 @@ A wizard utility to help set up tezos-baker.
 Asks questions, validates answers, and executes the appropriate steps using the final configuration.
 """
 
-import os, sys, shutil
-import readline
+import os, sys
 import re
 import time
-import urllib.request
-import json
-from typing import List
 import logging
 
 from tezos_baking.wizard_structure import *
 from tezos_baking.util import *
 from tezos_baking.steps import *
-from tezos_baking.provider import *
 from tezos_baking.validators import Validator
 import tezos_baking.validators as validators
 
@@ -72,12 +67,21 @@ Type in 'exit' to quit.
 
 
 def fetch_snapshot(url, sha256=None):
+    import urllib.error
 
     logging.info("Fetching snapshot")
 
     dirname = TMP_SNAPSHOT_LOCATION
     filename = os.path.join(dirname, "octez_node.snapshot")
     metadata_file = os.path.join(dirname, "octez_node.snapshot.sha256")
+    etag_file = os.path.join(dirname, "octez_node.snapshot.etag")
+
+    # reuses the probe made when the url was validated, if any
+    probe = probe_url(url)
+    # only strong ETags guarantee that byte ranges of the same snapshot are served
+    etag = probe.etag if probe.accepts_ranges and probe.etag else None
+    if etag is not None and etag.startswith("W/"):
+        etag = None
 
     # updates or removes the 'metadata_file' containing the snapshot's SHA256
     def dump_metadata(metadata_file=metadata_file, sha256=sha256):
@@ -89,9 +93,17 @@ def fetch_snapshot(url, sha256=None):
                 os.remove(metadata_file)
             except FileNotFoundError:
                 pass
+        if etag:
+            with open(etag_file, "w+") as f:
+                f.write(etag)
+        else:
+            try:
+                os.remove(etag_file)
+            except FileNotFoundError:
+                pass
 
     # reads `metadata_file` if any or returns None
-    def read_metadata(metadata_file=metadata_file):
+    def read_metadata(metadata_file):
         if os.path.exists(metadata_file):
             with open(metadata_file, "r") as f:
                 sha256 = f.read()
@@ -112,17 +124,24 @@ def fetch_snapshot(url, sha256=None):
                 raise e
 
     print_and_log(f"Downloading the snapshot from {url}")
+    if probe.size is not None:
+        print_and_log(f"Snapshot size: {human_readable_size(probe.size)}")
 
     # expected for the (possibly) existing chunk
-    expected_sha256 = read_metadata()
+    expected_sha256 = read_metadata(metadata_file)
+    expected_etag = read_metadata(etag_file)
 
     os.makedirs(dirname, exist_ok=True)
-    if sha256 and expected_sha256 and expected_sha256 == sha256:
+    if (sha256 and expected_sha256 and expected_sha256 == sha256) or (
+        not sha256 and etag and expected_etag == etag
+    ):
         logging.info("Continuing download")
         # that case means that the expected sha256 of snapshot
         # we want to download is the same as the expected
         # sha256 of the existing octez_node.snapshot file
         # when it will be fully downloaded
+        # (or, without sha256, that the server still serves the same
+        # file according to its ETag)
         # so that we can safely use `--continue` option here
         download(args="--continue")
     else:
@@ -251,6 +270,7 @@ region_step = Step(
 
 # We define this step as a function to better tailor snapshot options to the chosen history mode
 def get_snapshot_mode_query(config):
+    from tezos_baking.provider import default_providers, recommended_provider
 
     static_import_modes = {
         "file": "Import snapshot from a file",
@@ -476,7 +496,9 @@ class Setup(Setup):
 
     # Check the provider url and collect the most recent snapshot
     # that is suited for the chosen history mode and network
-    def get_snapshot_metadata(self, provider: Provider):
+    def get_snapshot_metadata(self, provider):
+        import urllib.error
+
         try:
             snapshot_metadata = provider.get_snapshot_metadata(
                 self.config["network"],
@@ -545,6 +567,8 @@ block timestamp: {timestamp} ({time_ago})
         )
 
     def fetch_snapshot_from_provider(self, name):
+        import urllib.error
+
         try:
             url = self.config["snapshots"][name]["url"]
             sha256 = self.config["snapshots"][name]["sha256"]
@@ -594,6 +618,8 @@ block timestamp: {timestamp} ({time_ago})
     # if the snapshot not found, tries to find it in other known
     # providers
     def get_snapshot_from_provider_with_fallback(self, provider):
+        from tezos_baking.provider import default_providers
+
         print_and_log(f"Getting snapshots' metadata from {provider.title}...")
 
         self.get_snapshot_metadata(provider)
@@ -614,6 +640,8 @@ block timestamp: {timestamp} ({time_ago})
         return (snapshot_file, snapshot_block_hash)
 
     def get_snapshot_from_direct_url(self, url):
+        import urllib.error
+
         try:
             self.query_step(snapshot_sha256_query)
             sha256 = self.config["snapshot_sha256"]
@@ -642,7 +670,9 @@ block timestamp: {timestamp} ({time_ago})
                 return (snapshot_file, None)
 
     def get_snapshot_from_provider_url(self, url):
-        provider = XtzShotsLike("custom", url)
+        from tezos_baking.provider import Marigold
+
+        provider = Marigold("custom", url)
         if os.path.basename(provider.metadata_url) == "tezos-snapshots.json":
             return self.get_snapshot_from_provider(provider)
         else:
@@ -654,6 +684,9 @@ block timestamp: {timestamp} ({time_ago})
 
     # Importing the snapshot for Node bootstrapping
     def import_snapshot(self):
+        import shutil
+        from tezos_baking.provider import default_providers, TzInit
+
         do_import = self.check_blockchain_data()
         valid_choice = False
 
@@ -758,6 +791,7 @@ block timestamp: {timestamp} ({time_ago})
 
     # Bootstrapping octez-node
     def bootstrap_node(self):
+        import urllib.request
 
         self.import_snapshot()
 
@@ -848,6 +882,8 @@ block timestamp: {timestamp} ({time_ago})
                     baker_set_up = True
 
     def stake_tez(self):
+        import json
+
         def get_minimal_frozen_stake():
             output = get_proc_output(
                 f"curl {self.config['node_rpc_endpoint']}/chains/main/blocks/head/context/constants"
@@ -949,6 +985,8 @@ block timestamp: {timestamp} ({time_ago})
         )
 
     def baker_registered(self):
+        import json
+
         tezos_client_options = self.get_tezos_client_options()
         baker_alias = self.config["baker_alias"]
         _, baker_key_hash = get_key_address(tezos_client_options, baker_alias)
@@ -1047,6 +1085,8 @@ block timestamp: {timestamp} ({time_ago})
 
 
 def main():
+    import readline
+
     readline.parse_and_bind("tab: complete")
     readline.set_completer_delims(" ")
 
@@ -9,7 +9,6 @@ Asks questions, validates answers, and executes the appropriate steps using the
 """
 
 import os, sys
-import readline
 import logging
 import re
 
@@ -47,6 +46,43 @@ parser.add_argument(
     "You need to already have set up the custom network using systemd services.",
 )
 
+parser.add_argument(
+    "--batch",
+    required=False,
+    nargs="+",
+    metavar="ALIAS[=BALLOT]",
+    help="Vote non-interactively for all the given baker aliases at once. "
+    "In the proposal period, the hashes from '--proposals' are submitted for every baker. "
+    "In the exploration and promotion periods, every baker submits the ballot given after "
+    "its alias, e.g. 'baker1=yay', or the one from '--ballot'. "
+    "Bakers that already voted or aren't in the voting listings are skipped.",
+)
+
+parser.add_argument(
+    "--ballot",
+    required=False,
+    choices=list(ballot_outcomes.keys()),
+    help="Default ballot for the bakers given with '--batch'.",
+)
+
+parser.add_argument(
+    "--proposals",
+    required=False,
+    nargs="+",
+    default=[],
+    metavar="PROPOSAL_HASH",
+    help="Proposal hashes to submit for the bakers given with '--batch'.",
+)
+
+parser.add_argument(
+    "--jobs",
+    required=False,
+    type=int,
+    default=4,
+    help="Maximum number of submissions run concurrently with '--batch'. "
+    "Bakers using a ledger are always handled one at a time.",
+)
+
 parsed_args = parser.parse_args()
 
 
@@ -85,6 +121,124 @@ def wait_for_ledger_app(app_name, client_dir):
         proc_call("sleep 1")
 
 
+# Voting state
+
+voting_rpcs = {
+    "current_period": "chains/main/blocks/head/votes/current_period",
+    "proposals": "chains/main/blocks/head/votes/proposals",
+    "current_proposal": "chains/main/blocks/head/votes/current_proposal",
+    "ballots": "chains/main/blocks/head/votes/ballots",
+    "listings": "chains/main/blocks/head/votes/listings",
+    "current_quorum": "chains/main/blocks/head/votes/current_quorum",
+    "constants": "chains/main/blocks/head/context/constants",
+}
+
+
+# Queries the node's voting RPCs concurrently and returns the voting state of the head block.
+# Voting powers are encoded either as numbers or strings depending on the protocol.
+def get_voting_state(rpc):
+    responses = dict(zip(voting_rpcs.keys(), rpc.get_many(list(voting_rpcs.values()))))
+    listings = {
+        listing.get("pkh", listing.get("delegate")): int(listing["voting_power"])
+        for listing in responses["listings"]
+    }
+    return {
+        "period": responses["current_period"]["voting_period"]["kind"],
+        "remaining": int(responses["current_period"]["remaining"]),
+        "proposals": sorted(
+            ((proposal, int(power)) for proposal, power in responses["proposals"]),
+            key=lambda x: x[1],
+            reverse=True,
+        ),
+        "current_proposal": responses["current_proposal"],
+        "ballots": {k: int(v) for k, v in responses["ballots"].items()},
+        "listings": listings,
+        "total_voting_power": sum(listings.values()),
+        # quorums are expressed in centiles of a percentage
+        "quorum": int(responses["current_quorum"]) / 100,
+        "proposal_quorum": int(responses["constants"]["min_proposal_quorum"]) / 100,
+    }
+
+
+def percentage(part, total):
+    return part * 100 / total if total else 0
+
+
+def print_voting_state(state):
+    total = state["total_voting_power"]
+    print(f"Blocks remaining in the current period: {state['remaining']}")
+    if state["period"] == "proposal":
+        if state["proposals"]:
+            print("Submitted proposals (share of the total voting power):")
+            for proposal, power in state["proposals"]:
+                print(f"  {proposal}: {percentage(power, total):.2f}%")
+        else:
+            print("No proposals have been submitted yet.")
+        print(f"A proposal needs at least {state['proposal_quorum']:.2f}% to advance.")
+    elif state["period"] in ["exploration", "promotion"]:
+        yay, nay, pass_ = (state["ballots"].get(b, 0) for b in ["yay", "nay", "pass"])
+        participation = percentage(yay + nay + pass_, total)
+        print(f"Participation: {participation:.2f}% (quorum: {state['quorum']:.2f}%)")
+        print(
+            f"Supermajority: {percentage(yay, yay + nay):.2f}% of yay among "
+            "yay and nay ballots (80% required)"
+        )
+    print()
+
+
+# Batch voting
+
+# The protocol allows a delegate to upvote at most 20 proposals during a proposal period,
+# which is also the maximal number of proposals in a single operation.
+max_proposals_per_delegate = 20
+
+
+# Parses the '--batch' entries into (alias, ballot) pairs
+def parse_batch_entries(entries, default_ballot):
+    bakers = []
+    for entry in entries:
+        alias, _, ballot = entry.partition("=")
+        ballot = ballot or default_ballot
+        if ballot is not None and ballot not in ballot_outcomes:
+            raise ValueError(f"Invalid ballot '{ballot}' for '{alias}'.")
+        bakers.append((alias, ballot))
+    return bakers
+
+
+# Gives a short explanation of the octez-client voting errors
+def explain_voting_error(stderr):
+    known_errors = [
+        (b"[Ii]nvalid proposal", "invalid proposal hash"),
+        (b"Unauthorized proposal", "not in the voting listings"),
+        (b"Not in a proposal period", "the voting period has advanced"),
+        (b"Too many proposals", "too many proposals submitted"),
+        (b"Unauthorized ballot", "already voted or not in the voting listings"),
+        (
+            b"Not in Exploration or Promotion period",
+            "the voting period has advanced",
+        ),
+    ]
+    for regex, explanation in known_errors:
+        if re.search(regex, stderr) is not None:
+            return explanation
+    lines = stderr.decode(errors="replace").strip().splitlines()
+    return lines[-1] if lines else "unknown error"
+
+
+def print_batch_report(report):
+    header = ("alias", "address", "status", "details")
+    rows = [header] + [
+        (r["alias"], r["address"] or "-", r["status"], r["details"]) for r in report
+    ]
+    widths = [max(len(row[i]) for row in rows) for i in range(3)]
+    print()
+    for row in rows:
+        line = "  ".join(c.ljust(w) for c, w in zip(row, widths)) + "  " + row[3]
+        print(line.rstrip())
+        logging.info(f"batch|{'|'.join(row)}")
+    print()
+
+
 # Steps
 
 new_proposal_query = Step(
@@ -134,15 +288,63 @@ ballot_outcome_query = Step(
 )
 
 
+# Public nodes whose head is more than this many blocks behind are marked as lagging
+max_head_lag = 2
+
+
+# Returns the round-trip time in milliseconds of the header RPC along with
+# the head level, or None if the node is unreachable
+def probe_rpc_endpoint(host, url_path):
+    import time
+    from tezos_baking.rpc import RpcClient, RpcError
+
+    try:
+        with RpcClient(host, timeout=url_probe_timeout) as rpc:
+            start = time.monotonic()
+            header = rpc.get(url_path)
+            rtt = (time.monotonic() - start) * 1000
+            return rtt, int(header["level"])
+    except (RpcError, KeyError, TypeError, ValueError) as e:
+        logging.info(f"Public node {host} is unreachable: {e}")
+        return None
+
+
+# Probes the public nodes concurrently, returning them ordered by latency, with
+# the lagging and unreachable ones last, along with the number of nodes that are up
+def rank_public_nodes(url_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(len(public_nodes)) as executor:
+        probes = list(
+            executor.map(lambda h: probe_rpc_endpoint(h, url_path), public_nodes)
+        )
+    levels = [probe[1] for probe in probes if probe is not None]
+    best_level = max(levels, default=0)
+
+    ranked = []
+    for (url, provider), probe in zip(public_nodes.items(), probes):
+        if probe is None:
+            ranked.append(((2, 0), url, f"{provider}, unreachable"))
+            continue
+        rtt, level = probe
+        lag = best_level - level
+        description = f"{provider}, {rtt:.0f}ms"
+        if lag > max_head_lag:
+            description += f", lagging {lag} blocks behind"
+        ranked.append(((int(lag > max_head_lag), rtt), url, description))
+        logging.info(f"Public node {url}: {rtt:.0f}ms, head level {level}")
+    ranked.sort(key=lambda node: node[0])
+    return {url: description for _, url, description in ranked}, len(levels)
+
+
 def get_node_rpc_endpoint_query(network, default=None):
     url_path = "chains/main/blocks/head/header"
-    node_is_alive = lambda host: url_is_reachable(mk_full_url(host, url_path))
 
-    relevant_nodes = {
-        url: provider
-        for url, provider in public_nodes.items()
-        if network == "mainnet" and node_is_alive(url)
-    }
+    relevant_nodes, alive_count = {}, 0
+    if network == "mainnet":
+        relevant_nodes, alive_count = rank_public_nodes(url_path)
+    if alive_count == 0:
+        relevant_nodes = {}
     return Step(
         id="node_rpc_endpoint",
         prompt="Provide the node's RPC address."
@@ -150,7 +352,7 @@ def get_node_rpc_endpoint_query(network, default=None):
         else "Choose one of the public nodes or provide the node's RPC address.",
         help="The node's RPC address will be used by octez-client to vote. If you have baking set up\n"
         "through systemd services, the address is usually 'http://localhost:8732' by default.",
-        default="1" if relevant_nodes and default is None else default,
+        default="1" if alive_count and default is None else default,
         options=relevant_nodes,
         validator=Validator(
             [
@@ -300,25 +502,25 @@ class Setup(Setup):
             self.config["network"] = "custom@" + parsed_args.network
 
     def fill_voting_period_info(self):
+        from tezos_baking.rpc import RpcClient, RpcError
+
         logging.info("Filling in voting period info")
-        logging.info("Getting voting period from octez-client")
-        voting_proc = get_proc_output(
-            f"sudo -u tezos {suppress_warning_text} octez-client "
-            f"{self.config['tezos_client_options']} show voting period"
-        )
-        if voting_proc.returncode == 0:
-            info = voting_proc.stdout
-        else:
+        logging.info("Getting voting period from the node RPC")
+        try:
+            with RpcClient(self.config["node_rpc_endpoint"]) as rpc:
+                state = get_voting_state(rpc)
+        except (RpcError, KeyError, ValueError) as e:
+            logging.error(f"Voting RPC error: {e}")
             print_and_log("Couldn't get the voting period info.", logging.error)
             print("Please check that the network for voting has been set up correctly.")
             raise KeyboardInterrupt
 
-        self.config["amendment_phase"] = (
-            re.search(b'Current period: "(\\w+)"', info).group(1).decode("utf-8")
-        )
-        self.config["proposal_hashes"] = [
-            phash.decode() for phash in re.findall(protocol_hash_regex, info)
-        ]
+        self.config["voting_state"] = state
+        self.config["amendment_phase"] = state["period"]
+        if state["current_proposal"] is not None:
+            self.config["proposal_hashes"] = [state["current_proposal"]]
+        else:
+            self.config["proposal_hashes"] = [p for p, _ in state["proposals"]]
 
     def process_proposal_period(self):
         logging.info("Processing proposal period")
@@ -453,6 +655,190 @@ class Setup(Setup):
                 )
                 raise OSError(result.stderr.decode())
 
+    # Non-interactive version of 'collect_baking_info'
+    def fill_batch_config(self):
+        self.check_baking_service()
+        if self.config["is_local_baking_setup"]:
+            self.fill_baking_config()
+        else:
+            network_dir = "/var/lib/tezos/client-" + self.config["network"]
+            self.config["client_data_dir"] = network_dir
+            self.config["node_rpc_endpoint"] = self.search_client_config(
+                "endpoint", None
+            )
+            if self.config["node_rpc_endpoint"] is None:
+                print_and_log(
+                    "No node RPC endpoint is configured for this network.",
+                    logging.error,
+                )
+                print("Please run 'tezos-vote' interactively once to configure it.")
+                raise KeyboardInterrupt
+        self.config["tezos_client_options"] = self.get_tezos_client_options()
+
+    # Checks every baker against the voting state and returns the report entries
+    # of the bakers together with the votes left for them to submit
+    def plan_batch_votes(self, bakers, state, rpc):
+        from concurrent.futures import ThreadPoolExecutor
+
+        options = self.config["tezos_client_options"]
+        period = state["period"]
+        with ThreadPoolExecutor(max(1, parsed_args.jobs)) as executor:
+            keys = list(executor.map(lambda b: get_key_address(options, b[0]), bakers))
+
+        report = []
+        for (alias, ballot), key in zip(bakers, keys):
+            value, address = key if key is not None else (None, None)
+            report.append(
+                {
+                    "alias": alias,
+                    "address": address,
+                    "ledger": value is not None
+                    and re.match(ledger_regex.decode(), value) is not None,
+                    "ballot": ballot,
+                    "proposals": [],
+                    "submit": False,
+                    "status": "skipped",
+                    "details": "",
+                }
+            )
+            if key is None:
+                report[-1]["details"] = "unknown alias"
+            elif address not in state["listings"]:
+                report[-1]["details"] = "not in the voting listings"
+
+        listed = [r for r in report if not r["details"]]
+        voting_infos = rpc.get_many(
+            [
+                f"chains/main/blocks/head/context/delegates/{r['address']}/voting_info"
+                for r in listed
+            ]
+        )
+        for r, info in zip(listed, voting_infos):
+            if period == "proposal":
+                upvoted = set(info.get("current_proposals", []))
+                remaining = int(
+                    info.get("remaining_proposals", max_proposals_per_delegate)
+                )
+                proposals = [p for p in parsed_args.proposals if p not in upvoted]
+                r["proposals"] = proposals[:remaining]
+                r["submit"] = bool(r["proposals"])
+                if not proposals:
+                    r["details"] = "already upvoted all the proposals"
+                elif not r["proposals"]:
+                    r["details"] = "no proposals left to upvote in this period"
+                elif len(r["proposals"]) < len(proposals):
+                    r["details"] = f"only {remaining} proposals left to upvote"
+            elif info.get("current_ballot") is not None:
+                r["details"] = f"already voted '{info['current_ballot']}'"
+            elif r["ballot"] is None:
+                r["details"] = "no ballot given"
+            else:
+                r["submit"] = True
+        return report
+
+    def submit_batch_vote(self, entry):
+        options = self.config["tezos_client_options"]
+        if self.config["amendment_phase"] == "proposal":
+            proposals = entry["proposals"]
+            commands = [
+                "submit proposals for "
+                + entry["alias"]
+                + " "
+                + " ".join(proposals[i : i + max_proposals_per_delegate])
+                for i in range(0, len(proposals), max_proposals_per_delegate)
+            ]
+        else:
+            commands = [
+                f"submit ballot for {entry['alias']} "
+                f"{self.config['proposal_hashes'][0]} {entry['ballot']}"
+            ]
+        if entry["ledger"]:
+            print(
+                color(
+                    f"Waiting for your response to the prompt on your Ledger Device for {entry['alias']}...",
+                    color_green,
+                )
+            )
+        for command in commands:
+            result = get_proc_output(
+                f"sudo -u tezos {suppress_warning_text} octez-client {options} {command}"
+            )
+            if result.returncode != 0:
+                logging.error(f"{command} failed: {result.stderr.decode()}")
+                entry["status"] = "failed"
+                entry["details"] = explain_voting_error(result.stderr)
+                return entry
+        entry["status"] = "submitted"
+        if self.config["amendment_phase"] == "proposal":
+            entry["details"] = " ".join(entry["proposals"]) + (
+                "; " + entry["details"] if entry["details"] else ""
+            )
+        else:
+            entry["details"] = entry["ballot"]
+        return entry
+
+    def run_batch_voting(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from tezos_baking.rpc import RpcClient, RpcError
+
+        try:
+            bakers = parse_batch_entries(parsed_args.batch, parsed_args.ballot)
+            for proposal in parsed_args.proposals:
+                validators.protocol_hash(proposal)
+        except ValueError as e:
+            print_and_log(str(e), logging.error, color_red)
+            raise KeyboardInterrupt
+
+        self.get_network()
+        self.fill_batch_config()
+
+        logging.info("Getting the voting state for batch voting")
+        try:
+            with RpcClient(self.config["node_rpc_endpoint"]) as rpc:
+                state = get_voting_state(rpc)
+                period = state["period"]
+                self.config["amendment_phase"] = period
+                self.config["proposal_hashes"] = [state["current_proposal"]]
+                print_and_log(f"The amendment is currently in the {period} period.")
+                print_voting_state(state)
+                if period not in ["proposal", "exploration", "promotion"]:
+                    print_and_log("Voting isn't possible at the moment.")
+                    return True
+                if period == "proposal" and not parsed_args.proposals:
+                    print_and_log(
+                        "Please provide the proposals to submit with '--proposals'.",
+                        logging.error,
+                    )
+                    return False
+                report = self.plan_batch_votes(bakers, state, rpc)
+        except (RpcError, KeyError, ValueError) as e:
+            logging.error(f"Voting RPC error: {e}")
+            print_and_log("Couldn't get the voting period info.", logging.error)
+            print("Please check that the network for voting has been set up correctly.")
+            raise KeyboardInterrupt
+
+        pending = [r for r in report if r["submit"]]
+        with ThreadPoolExecutor(max(1, parsed_args.jobs)) as executor:
+            list(
+                executor.map(
+                    self.submit_batch_vote, [r for r in pending if not r["ledger"]]
+                )
+            )
+
+        ledger_bakers = [r for r in pending if r["ledger"]]
+        if ledger_bakers:
+            wait_for_ledger_app("Wallet", self.config["client_data_dir"])
+            for entry in ledger_bakers:
+                self.submit_batch_vote(entry)
+            if self.config["is_local_baking_setup"]:
+                wait_for_ledger_app("Baking", self.config["client_data_dir"])
+                net = self.config["network"]
+                print_and_log(f"Restarting local {net} baking setup")
+                proc_call(f"sudo systemctl restart tezos-baking-{net}.service")
+
+        print_batch_report(report)
+        return all(r["status"] != "failed" for r in report)
+
     def run_voting(self):
 
         print(welcome_text)
@@ -467,12 +853,12 @@ class Setup(Setup):
         if self.check_ledger_use():
             wait_for_ledger_app("Wallet", self.config["client_data_dir"])
 
-        # process 'tezos-client show voting period'
         self.fill_voting_period_info()
 
         print_and_log(
             f"The amendment is currently in the {self.config['amendment_phase']} period."
         )
+        print_voting_state(self.config["voting_state"])
         if self.config["amendment_phase"] == "proposal":
             print(
                 "Bakers can submit up to 20 protocol amendment proposals,",
@@ -505,6 +891,8 @@ class Setup(Setup):
 
 
 def main():
+    import readline
+
     readline.parse_and_bind("tab: complete")
     readline.set_completer_delims(" ")
 
@@ -512,7 +900,11 @@ def main():
         setup_logger("tezos-vote.log")
         logging.info("Starting the Tezos Voting Wizard.")
         setup = Setup()
-        setup.run_voting()
+        if parsed_args.batch:
+            if not setup.run_batch_voting():
+                sys.exit(1)
+        else:
+            setup.run_voting()
     except KeyboardInterrupt:
         print("Exiting the Tezos Voting Wizard.")
         logging.info(f"Received keyboard interrupt.")
@@ -7,9 +7,8 @@ Common utilities
 
 import sys, subprocess, shlex
 import re
-import urllib.request
-import json
 import os
+from collections import namedtuple
 
 # Regexes
 
@@ -30,10 +29,155 @@ http_request_headers = {"User-Agent": "Mozilla/5.0"}
 suppress_warning_text = "TEZOS_CLIENT_UNSAFE_DISABLE_DISCLAIMER=YES"
 
 
+# Subprocess tracing
+#
+# Set TEZOS_BAKING_TRACE=1 to record every command run through 'proc_call' and
+# 'get_proc_output'. A per-family summary is printed and logged on exit.
+
+proc_trace_env_var = "TEZOS_BAKING_TRACE"
+
+# octez-client global options that take a value, skipped when computing the command family
+options_with_values = ["--base-dir", "-d", "--endpoint", "-E", "-R", "-u"]
+
+
+def redact_secrets(cmd):
+    return re.sub(secret_key_regex.decode("utf-8"), "<redacted>", cmd)
+
+
+# Reduces a command to the program name followed by at most two subcommand words,
+# e.g. 'sudo -u tezos octez-client --base-dir ... show address baker' -> 'octez-client show address'
+def command_family(argv):
+    args = list(argv)
+    if args and os.path.basename(args[0]) == "sudo":
+        args = args[1:]
+        while args and args[0].startswith("-"):
+            args = args[2:] if args[0] in options_with_values else args[1:]
+    while args and re.match(r"^\w+=", args[0]):
+        args = args[1:]
+    if not args:
+        return "<empty>"
+    family = [os.path.basename(args[0])]
+    rest = args[1:]
+    while rest and len(family) < 3:
+        arg = rest.pop(0)
+        if arg in options_with_values:
+            rest = rest[1:]
+        elif arg.startswith("-"):
+            continue
+        elif re.match(r"^[a-z][a-z\-]*$", arg):
+            family.append(arg)
+        else:
+            break
+    return " ".join(family)
+
+
+class ProcTracer:
+    def __init__(self):
+        self.records = []
+
+    def record(self, argv, cmd, duration, returncode, output_size):
+        self.records.append(
+            {
+                "cmd": redact_secrets(cmd),
+                "family": command_family(argv),
+                "duration": duration,
+                "returncode": returncode,
+                "output_size": output_size,
+            }
+        )
+
+    def summary(self):
+        families = {}
+        for rec in self.records:
+            family = families.setdefault(
+                rec["family"], {"count": 0, "total": 0.0, "failures": 0, "output": 0}
+            )
+            family["count"] += 1
+            family["total"] += rec["duration"]
+            family["failures"] += rec["returncode"] != 0
+            family["output"] += rec["output_size"] or 0
+        rows = sorted(families.items(), key=lambda x: x[1]["total"], reverse=True)
+        width = max([len("command")] + [len(name) for name, _ in rows])
+        lines = [
+            f"{'command':<{width}}  {'calls':>5}  {'failed':>6}  {'total s':>9}  {'mean s':>8}  {'output B':>10}"
+        ]
+        for name, f in rows:
+            lines.append(
+                f"{name:<{width}}  {f['count']:>5}  {f['failures']:>6}  {f['total']:>9.3f}  "
+                f"{f['total'] / f['count']:>8.3f}  {f['output']:>10}"
+            )
+        total = sum(rec["duration"] for rec in self.records)
+        lines.append(f"{len(self.records)} commands, {total:.3f}s total")
+        return "\n".join(lines)
+
+    def report(self):
+        import logging
+
+        if not self.records:
+            return
+        summary = self.summary()
+        print()
+        print("Subprocess trace summary:")
+        print(summary)
+        for rec in self.records:
+            logging.debug(
+                f"trace|{rec['duration']:.3f}s|exit {rec['returncode']}|"
+                f"{rec['output_size']}B|{rec['cmd']}"
+            )
+        logging.info("Subprocess trace summary:\n" + summary)
+
+
+proc_tracer = None
+
+
+def enable_proc_tracing():
+    global proc_tracer
+    if proc_tracer is None:
+        import atexit
+        import logging  # so that our report runs before logging shuts down
+
+        proc_tracer = ProcTracer()
+        atexit.register(proc_tracer.report)
+    return proc_tracer
+
+
+if os.getenv(proc_trace_env_var):
+    enable_proc_tracing()
+
+
+def traced(run):
+    def _run(cmd):
+        if proc_tracer is None:
+            return run(cmd)
+        import time
+
+        argv = shlex.split(cmd)
+        start = time.monotonic()
+        try:
+            result = run(cmd)
+        except subprocess.CalledProcessError as e:
+            proc_tracer.record(argv, cmd, time.monotonic() - start, e.returncode, None)
+            raise
+        except OSError:
+            proc_tracer.record(argv, cmd, time.monotonic() - start, 127, None)
+            raise
+        if isinstance(result, subprocess.CompletedProcess):
+            returncode = result.returncode
+            output_size = len(result.stdout or b"") + len(result.stderr or b"")
+        else:
+            returncode, output_size = result, None
+        proc_tracer.record(argv, cmd, time.monotonic() - start, returncode, output_size)
+        return result
+
+    return _run
+
+
+@traced
 def proc_call(cmd):
     return subprocess.check_call(shlex.split(cmd))
 
 
+@traced
 def get_proc_output(cmd):
     if sys.version_info.major == 3 and sys.version_info.minor < 7:
         return subprocess.run(shlex.split(cmd), stdout=subprocess.PIPE)
@@ -96,6 +240,16 @@ def replace_systemd_service_env(service_name, field, value):
             )
 
 
+def human_readable_size(nbytes):
+    suffixes = ["B", "KB", "MB", "GB", "TB", "PB"]
+    i = 0
+    while nbytes >= 1024 and i < len(suffixes) - 1:
+        nbytes /= 1024.0
+        i += 1
+    f = ("%.2f" % nbytes).rstrip("0").rstrip(".")
+    return "%s%s" % (f, suffixes[i])
+
+
 def progressbar_hook(chunk_number, chunk_size, total_size):
     done = chunk_number * chunk_size
     percent = min(int(done * 100 / total_size), 100)
@@ -141,10 +295,69 @@ def mk_full_url(host_name, path):
     return url
 
 
+# Result of probing a URL without downloading its body.
+# 'size' and 'etag' are None when the server doesn't provide them.
+UrlProbe = namedtuple("UrlProbe", ["reachable", "size", "etag", "accepts_ranges"])
+
+url_probe_timeout = 10
+
+# Successful probes are memoized for the whole session, so that e.g. the snapshot
+# download can reuse the probe done when validating the snapshot URL.
+url_probes = {}
+
+
+def probe_response(response):
+    headers = response.headers
+    size = None
+    content_range = re.search("/([0-9]+)$", headers.get("Content-Range", ""))
+    if response.status == 206 and content_range is not None:
+        size = int(content_range.group(1))
+    elif headers.get("Content-Length") is not None:
+        size = int(headers.get("Content-Length"))
+    accepts_ranges = (
+        response.status == 206 or headers.get("Accept-Ranges", "").lower() == "bytes"
+    )
+    return UrlProbe(True, size, headers.get("ETag"), accepts_ranges)
+
+
+# Checks that the URL is available using a HEAD request, falling back to a
+# 1-byte range GET request for servers that don't support HEAD.
+def probe_url(url, timeout=url_probe_timeout):
+    if url in url_probes:
+        return url_probes[url]
+
+    import http.client
+    import urllib.request
+
+    # urllib turns redirected HEAD requests into GET ones, keep the method instead
+    class RedirectHandler(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, req, fp, code, msg, headers, newurl):
+            new_req = super().redirect_request(req, fp, code, msg, headers, newurl)
+            if new_req is not None:
+                new_req.method = req.get_method()
+            return new_req
+
+    opener = urllib.request.build_opener(RedirectHandler)
+    probe = UrlProbe(False, None, None, False)
+    for method, headers in [("HEAD", {}), ("GET", {"Range": "bytes=0-0"})]:
+        try:
+            req = urllib.request.Request(
+                url, headers={**http_request_headers, **headers}, method=method
+            )
+            # the body is never read, the connection is closed right away
+            with opener.open(req, timeout=timeout) as response:
+                probe = probe_response(response)
+            break
+        except urllib.error.HTTPError:
+            # e.g. '405 Method Not Allowed' for HEAD, retry with GET
+            continue
+        except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError):
+            break
+
+    if probe.reachable:
+        url_probes[url] = probe
+    return probe
+
+
 def url_is_reachable(url):
-    req = urllib.request.Request(url, headers=http_request_headers)
-    try:
-        urllib.request.urlopen(req)
-        return True
-    except (urllib.error.URLError, ValueError):
-        return False
+    return probe_url(url).reachable
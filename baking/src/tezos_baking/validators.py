@@ -167,18 +167,12 @@ def protocol_hash(input):
     return input
 
 
-from dataclasses import dataclass
-from typing import *
-
-ValidatorFunction = Callable[[str], str]
-
-
-@dataclass
+# 'validator' is either a single function or a list of functions, each taking the input
+# string and returning it (possibly altered) or raising a ValueError.
+# This is a plain class rather than a dataclass to keep the wizards' startup fast.
 class Validator:
-    validator: Union[
-        ValidatorFunction,
-        List[ValidatorFunction],
-    ] = lambda x: x
+    def __init__(self, validator=lambda x: x):
+        self.validator = validator
 
     def validate(self, input: str):
         if isinstance(self.validator, list):
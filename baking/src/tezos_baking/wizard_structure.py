@@ -8,13 +8,10 @@ Helps with writing a tool that asks questions, validates answers, and executes
 the appropriate steps using the final configuration.
 """
 
-import os, sys, subprocess, shlex, shutil
-import re, textwrap
+import os, sys
+import re
 import argparse
 import logging
-from logging.handlers import RotatingFileHandler
-import urllib.request
-import json
 
 from tezos_baking.util import *
 from tezos_baking.validators import Validator
@@ -86,6 +83,8 @@ def wait_for_ledger_app(ledger_app, client_dir):
 
 
 def search_json_with_default(json_filepath, field, default):
+    import json
+
     with open(json_filepath, "r") as f:
         try:
             json_dict = json.load(f)
@@ -95,6 +94,8 @@ def search_json_with_default(json_filepath, field, default):
 
 
 def setup_logger(log_file):
+    from logging.handlers import RotatingFileHandler
+
     log_dir = f"{os.getenv('HOME')}/.tezos-logs/.debug"
     os.makedirs(log_dir, exist_ok=True)
     log_file = os.path.join(log_dir, log_file)
@@ -237,6 +238,9 @@ class Setup:
         self.config["remote_key"] = rsu.group(2)
 
     def get_current_head_level(self):
+        import json
+        import urllib.request
+
         response = urllib.request.urlopen(
             self.config["node_rpc_endpoint"] + "/chains/main/blocks/head/header"
         )
@@ -266,6 +270,7 @@ class Setup:
             return True
 
     def import_key(self, key_mode_query, ledger_app=None):
+        import shutil
 
         baker_alias = self.config["baker_alias"]
         tezos_client_options = self.get_tezos_client_options()
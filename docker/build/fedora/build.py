@@ -40,6 +40,10 @@ def build_fedora(args=None) -> List[str]:
     else:
         binaries_dir_name = None
 
+    if args.cache_dir:
+        os.makedirs(args.cache_dir, exist_ok=True)
+        docker_volumes.append(f"{args.cache_dir}:/tezos-packaging/docker/cache")
+
     target_os = args.os
 
     with open("./docker/supported_versions.json") as f:
@@ -67,18 +71,21 @@ def build_fedora(args=None) -> List[str]:
 
     output_dir = args.output_dir
 
-    artifacts = []
+    import_images(virtualisation_engine, args.import_images)
+
+    builds = []
 
     for image in images:
 
         distros = distributions
 
-        artifacts += run_build(
+        builds.append(
             Arguments(
                 os=target_os,
                 image=image,
                 octez_version=octez_version,
-                output_dir=output_dir,
+                # each container gets its own output subdirectory, merged once all are done
+                output_dir=os.path.join(output_dir, image),
                 distributions=distros,
                 docker_volumes=docker_volumes,
                 virtualisation_engine=virtualisation_engine,
@@ -92,11 +99,33 @@ def build_fedora(args=None) -> List[str]:
                         f"--type {args.type}",
                         f"--distributions {' '.join(distros)}",
                         f"--packages {' '.join(packages_to_build.keys())}",
+                        f"--jobs {args.jobs}",
+                        f"--sources-staging {args.sources_staging}",
+                        f"--mock-jobs {args.mock_jobs}",
+                        f"--mock-archs {' '.join(args.mock_archs)}",
+                        f"--source-compression {args.source_compression}",
+                        "--build-once" if args.build_once else "",
+                        "--with-dependents" if args.with_dependents else "",
+                        "--cache-dir cache" if args.cache_dir else "",
                     ]
                 ),
+                log_prefix=f"[{image}] " if args.concurrent_builds > 1 else None,
+                output_mode=args.output_mode,
             )
         )
 
+    artifacts = run_builds(builds, args.concurrent_builds)
+
+    merge_output_dirs(output_dir, [os.path.join(output_dir, image) for image in images])
+
+    report_reused_images()
+
+    export_images(
+        virtualisation_engine,
+        args.export_images,
+        [builder_image_tag(target_os, image) for image in images],
+    )
+
     return list(map(lambda x: os.path.join(args.output_dir, x), artifacts))
 
 
@@ -107,9 +136,10 @@ def main(args=None) -> List[str]:
     if args is None:
         args = parser.parse_args()
 
-    artifacts = build_fedora(args)
-
-    return artifacts
+    try:
+        return build_fedora(args)
+    finally:
+        write_telemetry_report(args)
 
 
 if __name__ == "__main__":
@@ -22,12 +22,16 @@ def sign_fedora(args: Arguments):
 
     gpg = shutil.which("gpg")
 
-    for f in artifacts:
-        if f.endswith(".src.rpm"):
-            subprocess.check_call(
-                f'rpmsign --define="%_gpg_name {identity}" --define="%__gpg {gpg}" --addsign {f}',
-                shell=True,
-            )
+    def sign(f):
+        subprocess.check_call(
+            f'rpmsign --define="%_gpg_name {identity}" --define="%__gpg {gpg}" --addsign {f}',
+            shell=True,
+        )
+
+    rpms = [f for f in artifacts if f.endswith(".src.rpm")]
+    timings = run_signing(args, rpms, sign)
+
+    write_manifest(args, rpms, timings, verify_rpms(rpms, identity))
 
 
 def main(args: Optional[Arguments] = None):
@@ -53,11 +53,17 @@ def upload_fedora(args: Arguments):
 
     chroots = " ".join(f"-r {chroot}" for chroot in chroots)
 
-    for f in filter(lambda x: x.endswith(".src.rpm"), packages):
-        subprocess.check_call(
-            f"copr-cli build {chroots} --nowait {copr_project} {f}",
-            shell=True,
-        )
+    make_upload_scheduler(args).run(
+        [
+            (
+                f"{copr_project} {chroots}",
+                f,
+                f"{copr_cli_command} build {chroots} --nowait {copr_project} {f}",
+            )
+            for f in packages
+            if f.endswith(".src.rpm")
+        ]
+    )
 
 
 def main(args: Optional[Arguments] = None):
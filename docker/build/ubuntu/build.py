@@ -49,6 +49,10 @@ def build_ubuntu(args=None) -> List[str]:
     else:
         sources_dir_name = None
 
+    if args.cache_dir:
+        os.makedirs(args.cache_dir, exist_ok=True)
+        docker_volumes.append(f"{args.cache_dir}:/tezos-packaging/docker/cache")
+
     target_os = args.os
 
     with open("./docker/supported_versions.json") as f:
@@ -81,44 +85,69 @@ def build_ubuntu(args=None) -> List[str]:
 
     output_dir = args.output_dir
 
-    artifacts = []
+    def image_build(image):
+        distros = [image]
+        return Arguments(
+            os=target_os,
+            image=image,
+            octez_version=octez_version,
+            # each container gets its own output subdirectory, merged once all are done
+            output_dir=os.path.join(output_dir, image),
+            distributions=distros,
+            docker_volumes=list(docker_volumes),
+            virtualisation_engine=virtualisation_engine,
+            container_create_args="",
+            cmd_args=" ".join(
+                [
+                    f"--os {target_os}",
+                    f"--binaries-dir {binaries_dir_name}" if binaries_dir_name else "",
+                    f"--sources-dir {sources_dir_name}" if sources_dir_name else "",
+                    f"--type {args.type}",
+                    f"--distributions {' '.join(distros)}",
+                    f"--launchpad-sources" if args.launchpad_sources else "",
+                    f"--launchpad-url {args.launchpad_url}"
+                    if args.launchpad_sources
+                    else "",
+                    f"--packages {' '.join(packages_to_build.keys())}",
+                    f"--jobs {args.jobs}",
+                    f"--sources-staging {args.sources_staging}",
+                    "--build-once" if args.build_once else "",
+                    "--with-dependents" if args.with_dependents else "",
+                    "--cache-dir cache" if args.cache_dir else "",
+                ]
+            ),
+            log_prefix=f"[{image}] " if args.concurrent_builds > 1 else None,
+            output_mode=args.output_mode,
+        )
 
-    for image in images:
+    import_images(virtualisation_engine, args.import_images)
 
-        distros = [image]
+    artifacts = []
 
-        artifacts += run_build(
-            Arguments(
-                os=target_os,
-                image=image,
-                octez_version=octez_version,
-                output_dir=output_dir,
-                distributions=distros,
-                docker_volumes=docker_volumes,
-                virtualisation_engine=virtualisation_engine,
-                container_create_args="",
-                cmd_args=" ".join(
-                    [
-                        f"--os {target_os}",
-                        f"--binaries-dir {binaries_dir_name}"
-                        if binaries_dir_name
-                        else "",
-                        f"--sources-dir {sources_dir_name}" if sources_dir_name else "",
-                        f"--type {args.type}",
-                        f"--distributions {' '.join(distros)}",
-                        f"--launchpad-sources" if args.launchpad_sources else "",
-                        f"--packages {' '.join(packages_to_build.keys())}",
-                    ]
-                ),
-            )
+    # the same source archive has to be reused for an ubuntu package on different distros,
+    # so it's produced by the build for the first image before the other ones start
+    remaining_images = images
+    if args.type == "source" and sources_dir_name is None:
+        artifacts += run_builds([image_build(images[0])], 1)
+        sources_dir_name = "origs"
+        docker_volumes.append(
+            f"{os.path.join(output_dir, images[0])}:/tezos-packaging/docker/{sources_dir_name}/"
         )
+        remaining_images = images[1:]
+
+    artifacts += run_builds(
+        [image_build(image) for image in remaining_images], args.concurrent_builds
+    )
+
+    merge_output_dirs(output_dir, [os.path.join(output_dir, image) for image in images])
 
-        # the same source archive has to be reused for an ubuntu package on different distros
-        if sources_dir_name is None:
-            sources_dir_name = "origs"
-            docker_volumes.append(
-                f"{args.output_dir}:/tezos-packaging/docker/{sources_dir_name}/"
-            )
+    report_reused_images()
+
+    export_images(
+        virtualisation_engine,
+        args.export_images,
+        [builder_image_tag(target_os, image) for image in images],
+    )
 
     return list(map(lambda x: os.path.join(args.output_dir, x), artifacts))
 
@@ -130,9 +159,10 @@ def main(args=None) -> List[str]:
     if args is None:
         args = make_ubuntu_parser(parser).parse_args()
 
-    artifacts = build_ubuntu(args)
-
-    return artifacts
+    try:
+        return build_ubuntu(args)
+    finally:
+        write_telemetry_report(args)
 
 
 if __name__ == "__main__":
@@ -20,14 +20,18 @@ def sign_ubuntu(args: Arguments):
 
     identity = args.identity
 
-    gpg = shutil.which("gpg")
-
-    for f in artifacts:
-        if f.endswith(".changes"):
-            subprocess.check_call(
-                f"sed -i 's/^Changed-By: .*$/Changed-By: {identity}/' {f}", shell=True
-            )
-            subprocess.check_call(f"debsign {f}", shell=True)
+    def sign(f):
+        subprocess.check_call(
+            f"sed -i 's/^Changed-By: .*$/Changed-By: {identity}/' {f}", shell=True
+        )
+        subprocess.check_call(f"debsign {f}", shell=True)
+
+    changes = [f for f in artifacts if f.endswith(".changes")]
+    timings = run_signing(args, changes, sign)
+
+    # 'debsign' also signs the '.dsc' files the '.changes' files refer to
+    signed = changes + [f for f in artifacts if f.endswith(".dsc")]
+    write_manifest(args, signed, timings, verify_clearsigned(signed))
 
 
 def main(args: Optional[Arguments] = None):
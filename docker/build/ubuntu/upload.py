@@ -69,11 +69,13 @@ login       = anonymous
 
     packages = get_artifact_list(args)
 
-    for f in filter(lambda x: x.endswith(".changes"), packages):
-        subprocess.check_call(
-            f"execute-dput -c dput.cfg {launchpad_ppa} {f}",
-            shell=True,
-        )
+    make_upload_scheduler(args).run(
+        [
+            (launchpad_ppa, f, f"{dput_command} -c dput.cfg {launchpad_ppa} {f}")
+            for f in packages
+            if f.endswith(".changes")
+        ]
+    )
 
 
 def main(args: Optional[Arguments] = None):
@@ -6,9 +6,11 @@ import sys
 import json
 import copy
 import shlex
+import shutil
+import threading
 import subprocess
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 from pathlib import Path
 
 sys.path.append("docker")
@@ -16,6 +18,7 @@ from package.package_generator import output_dir as container_output_dir
 from package.package_generator import common_parser
 from package.package_generator import make_ubuntu_parser
 from package.packages import packages
+from package.telemetry import telemetry
 
 
 parser = copy.deepcopy(common_parser)
@@ -31,6 +34,35 @@ parser.add_argument(
     action="store_true",
 )
 parser.set_defaults(build_sapling_package=False)
+parser.add_argument(
+    "--concurrent-builds",
+    help="number of distribution images to build in concurrently running containers",
+    type=int,
+    default=1,
+)
+parser.add_argument(
+    "--output-mode",
+    help="how the packages get to the output dir: copied out of the container once "
+    "it's done, or written in place to the output dir bind-mounted into the container",
+    choices=["copy", "bind"],
+    default="copy",
+)
+parser.add_argument(
+    "--import-images",
+    help="load previously exported builder images from the given tarball before building",
+    type=os.path.abspath,
+)
+parser.add_argument(
+    "--export-images",
+    help="save the builder images used by the build to the given tarball, e.g. for offline builders",
+    type=os.path.abspath,
+)
+parser.add_argument(
+    "--telemetry-report",
+    help="where to write the JSON report with the time spent and bytes produced by each "
+    "stage of the build, 'telemetry.json' in the output dir by default",
+    type=os.path.abspath,
+)
 
 
 def check_call(cmd):
@@ -45,6 +77,21 @@ def get_proc_output(cmd):
     return subprocess.run(shlex.split(cmd), capture_output=True, text=True)
 
 
+def call_with_prefix(cmd, prefix):
+    if prefix is None:
+        return call(cmd)
+    proc = subprocess.Popen(
+        shlex.split(cmd),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        errors="replace",
+    )
+    for line in proc.stdout:
+        print(f"{prefix}{line}", end="", flush=True)
+    return proc.wait()
+
+
 def get_packages_to_build(arg):
     if arg:
         for pkg in arg:
@@ -71,6 +118,133 @@ class Arguments:
     docker_volumes: List[str]
     virtualisation_engine: str
     container_create_args: str
+    log_prefix: Optional[str] = None
+    output_mode: str = "copy"
+
+
+# Containers of the builds that are currently running, removed on cancellation
+running_containers = {}
+builds_cancelled = threading.Event()
+
+
+# Label of the builder images holding the time it took to build them
+build_time_label = "tezos-packaging.build-seconds"
+
+
+def dockerfile_inputs(dockerfile):
+    """
+    List the files of the build context that the Dockerfile copies into the image.
+    """
+    import glob
+
+    inputs = []
+    with open(dockerfile, "r") as f:
+        for line in f:
+            words = line.split()
+            if not words or words[0] != "COPY":
+                continue
+            if any(word.startswith("--from") for word in words):
+                continue
+            for pattern in words[1:-1]:
+                inputs += sorted(glob.glob(pattern))
+    return inputs
+
+
+def builder_image_tag(target_os, image):
+    """
+    Tag the builder image with a hash of its Dockerfile, build args and copied files,
+    including the tezos revision from meta.json, which pins the opam-repository revision.
+    """
+    import hashlib
+    from package.cache import update_with_file, update_with_tree
+
+    dockerfile = f"docker/package/Dockerfile-{target_os}"
+    with open("meta.json", "r") as f:
+        tezos_ref = json.load(f).get("tezos_ref")
+    h = hashlib.sha256()
+    h.update(json.dumps({"dist": image, "tezos_ref": tezos_ref}).encode())
+    update_with_file(h, dockerfile)
+    for path in dockerfile_inputs(dockerfile):
+        h.update(path.encode())
+        if os.path.isdir(path):
+            update_with_tree(h, path)
+        else:
+            update_with_file(h, path)
+    return f"tezos-{target_os}-{image}:{h.hexdigest()[:16]}"
+
+
+# Seconds of builder image builds skipped by reusing existing images
+reused_images = {}
+
+
+def image_build_time(virtualisation_engine, image_tag):
+    """
+    Return the recorded build time of the image, or None if there is no such image.
+    """
+    proc = get_proc_output(
+        f"""
+    {virtualisation_engine} image inspect
+    --format '{{{{ index .Config.Labels "{build_time_label}" }}}}' {image_tag}
+    """
+    )
+    if proc.returncode:
+        return None
+    try:
+        return float(proc.stdout.strip())
+    except ValueError:
+        return 0.0
+
+
+def build_image(args: Arguments, image_tag):
+    import time
+
+    virtualisation_engine = args.virtualisation_engine
+    log_prefix = args.log_prefix or ""
+
+    build_time = image_build_time(virtualisation_engine, image_tag)
+    if build_time is not None:
+        print(f"{log_prefix}Reusing {image_tag}, saved {build_time:.0f}s of build time")
+        reused_images[image_tag] = build_time
+        return
+
+    start = time.monotonic()
+    build_cmd = f"""
+    {virtualisation_engine}
+    build -t {image_tag}
+    -f docker/package/Dockerfile-{args.os} --build-arg dist={args.image} .
+    """
+    exit_code = call_with_prefix(build_cmd, args.log_prefix)
+    if exit_code:
+        raise subprocess.CalledProcessError(exit_code, shlex.split(build_cmd))
+    build_time = time.monotonic() - start
+
+    # record the build time in a label, so that it can be reported on reuse,
+    # also after the image has been exported and imported elsewhere
+    subprocess.run(
+        [virtualisation_engine, "build", "-t", image_tag, "-"],
+        input=f"FROM {image_tag}\nLABEL {build_time_label}={build_time:.0f}\n",
+        text=True,
+        capture_output=True,
+        check=True,
+    )
+
+
+def report_reused_images():
+    if reused_images:
+        print(
+            f"Reused {len(reused_images)} builder images, "
+            f"saved {sum(reused_images.values()):.0f}s of build time"
+        )
+
+
+def import_images(virtualisation_engine, path):
+    if path is not None:
+        check_call(f"{virtualisation_engine} load -i {path}")
+
+
+def export_images(virtualisation_engine, path, image_tags):
+    if path is not None:
+        check_call(f"{virtualisation_engine} save -o {path} {' '.join(image_tags)}")
 
 
 def run_build(args: Arguments) -> List[str]:
@@ -83,14 +257,12 @@ def run_build(args: Arguments) -> List[str]:
 
     octez_version = args.octez_version
 
-    # prebuild docker image before using containers
-    check_call(
-        f"""
-    {virtualisation_engine}
-    build -t tezos-{target_os}-{image}
-    -f docker/package/Dockerfile-{target_os} --build-arg dist={image} .
-    """
-    )
+    log_prefix = args.log_prefix
+
+    # prebuild docker image before using containers, unless it's already built
+    image_tag = builder_image_tag(target_os, image)
+    with telemetry.stage(None, "image-build", image=image):
+        build_image(args, image_tag)
 
     distros = args.distributions
 
@@ -98,7 +270,18 @@ def run_build(args: Arguments) -> List[str]:
 
     cmd_args = args.cmd_args
 
-    docker_volumes = args.docker_volumes
+    docker_volumes = list(args.docker_volumes)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    output_env = ""
+    if args.output_mode == "bind":
+        docker_volumes.append(
+            f"{args.output_dir}:/tezos-packaging/docker/{container_output_dir}"
+        )
+        # rootless podman already maps the container root to the current user
+        if virtualisation_engine == "docker":
+            output_env = f"--env OUTPUT_OWNER={os.getuid()}:{os.getgid()}"
 
     container_id = get_proc_output(
         f"""
@@ -107,25 +290,37 @@ def run_build(args: Arguments) -> List[str]:
     {container_create_args}
     --env OCTEZ_VERSION={octez_version}
     --env OPAMSOLVERTIMEOUT=900
-    -t tezos-{target_os}-{image} {cmd_args}
+    {output_env}
+    -t {image_tag} {cmd_args}
     """
     ).stdout.strip()
 
-    exit_code = call(f"{virtualisation_engine} start -a {container_id}")
-
-    os.makedirs(args.output_dir, exist_ok=True)
-
-    call(
-        f"""
-    {virtualisation_engine} cp
-    {container_id}:/tezos-packaging/docker/{container_output_dir}/. {args.output_dir}
-    """
-    )
+    running_containers[container_id] = virtualisation_engine
+    if builds_cancelled.is_set():
+        exit_code = 1
+    else:
+        with telemetry.stage(None, "container", image=image):
+            exit_code = call_with_prefix(
+                f"{virtualisation_engine} start -a {container_id}", log_prefix
+            )
+
+    if args.output_mode == "copy":
+        with telemetry.stage(None, "copy-output", args.output_dir, image=image):
+            call(
+                f"""
+            {virtualisation_engine} cp
+            {container_id}:/tezos-packaging/docker/{container_output_dir}/. {args.output_dir}
+            """
+            )
 
     call(f"{virtualisation_engine} rm -v {container_id}")
+    running_containers.pop(container_id, None)
+
+    # the generator writes its telemetry even when it fails, with the failed stage
+    telemetry.load(os.path.join(args.output_dir, ".telemetry.json"), image=image)
 
     if exit_code:
-        print("Unrecoverable error occured.")
+        print(f"{log_prefix or ''}Unrecoverable error occured.")
         sys.exit(exit_code)
 
     with open(os.path.join(args.output_dir, ".artifact_list"), "r") as f:
@@ -134,3 +329,48 @@ def run_build(args: Arguments) -> List[str]:
     call(f"rm -rf {os.path.join(args.output_dir, '.artifact_list')}")
 
     return artifacts
+
+
+def cancel_builds():
+    builds_cancelled.set()
+    for container_id, virtualisation_engine in list(running_containers.items()):
+        call(f"{virtualisation_engine} rm -f -v {container_id}")
+
+
+def run_builds(builds: List[Arguments], concurrent_builds: int) -> List[str]:
+    """
+    Run the builds in at most 'concurrent_builds' containers at once, returning the
+    artifacts in the order of the builds. Once a build fails or the run is interrupted,
+    the pending builds are cancelled and the running containers are removed.
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+    with ThreadPoolExecutor(max(1, concurrent_builds)) as executor:
+        futures = [executor.submit(run_build, build) for build in builds]
+        try:
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in done:
+                if future.exception() is not None:
+                    raise future.exception()
+            return [artifact for future in futures for artifact in future.result()]
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            cancel_builds()
+            raise
+
+
+def write_telemetry_report(args):
+    report = args.telemetry_report or os.path.join(args.output_dir, "telemetry.json")
+    telemetry.write(report)
+    print(telemetry.summary())
+    print(f"Telemetry report written to {report}")
+
+
+def merge_output_dirs(output_dir, subdirs):
+    """
+    Move the contents of the per-build output subdirectories to the output dir.
+    """
+    for subdir in subdirs:
+        for f in sorted(os.listdir(subdir)):
+            os.replace(os.path.join(subdir, f), os.path.join(output_dir, f))
+        shutil.rmtree(subdir)
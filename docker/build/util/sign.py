@@ -3,12 +3,17 @@
 
 import os
 import sys
+import json
+import time
 import shutil
 import argparse
 import subprocess
 from dataclasses import dataclass
 from typing import Optional, List
 
+sys.path.append("docker")
+from package.telemetry import telemetry
+
 parser = argparse.ArgumentParser()
 parser.add_argument(
     "--directory",
@@ -37,6 +42,19 @@ parser.add_argument(
     type=str,
     required=True,
 )
+parser.add_argument(
+    "--jobs",
+    "-j",
+    help="number of packages to sign concurrently",
+    type=int,
+    default=4,
+)
+parser.add_argument(
+    "--manifest",
+    help="path to write the signing manifest to, 'signing-manifest.json' "
+    "in the packages directory by default",
+    type=os.path.abspath,
+)
 
 
 @dataclass
@@ -45,6 +63,8 @@ class Arguments:
     directory: str
     artifacts: List[str]
     identity: str
+    jobs: int = 4
+    manifest: Optional[str] = None
 
 
 def fill_args(args) -> Arguments:
@@ -53,6 +73,8 @@ def fill_args(args) -> Arguments:
         directory=args.directory,
         artifacts=args.artifacts,
         identity=args.identity,
+        jobs=args.jobs,
+        manifest=args.manifest,
     )
 
 
@@ -75,3 +97,115 @@ def get_artifact_list(args: Arguments):
             filtered.append(x)
 
     return filtered
+
+
+def warm_gpg_agent(identity):
+    """
+    Start the gpg-agent and make it cache the passphrase of the key by signing
+    some data, so that the concurrent signers don't each ask for it.
+    """
+    subprocess.check_call(["gpgconf", "--launch", "gpg-agent"])
+    subprocess.run(
+        ["gpg", "--local-user", identity, "--detach-sign", "--output", "-"],
+        input=b"warm up",
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+
+
+def run_signing(args: Arguments, files, sign):
+    """
+    Sign the files concurrently with the 'sign' function, returning the time
+    it took for each of them.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def timed_sign(f):
+        start = time.monotonic()
+        with telemetry.stage(os.path.basename(f), "sign", f):
+            sign(f)
+        elapsed = time.monotonic() - start
+        print(f"Signed {os.path.basename(f)} in {elapsed:.1f}s")
+        return elapsed
+
+    if not files:
+        return {}
+    warm_gpg_agent(args.identity)
+    with ThreadPoolExecutor(max(1, args.jobs)) as executor:
+        return dict(zip(files, executor.map(timed_sign, files)))
+
+
+def verify_clearsigned(files):
+    """
+    Verify the signatures of the clearsigned files, returning the ones that failed.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def verify(f):
+        proc = subprocess.run(["gpg", "--verify", f], capture_output=True)
+        return proc.returncode == 0
+
+    with ThreadPoolExecutor(8) as executor:
+        return [f for f, ok in zip(files, executor.map(verify, files)) if not ok]
+
+
+def verify_rpms(files, identity):
+    """
+    Verify the signatures of the rpm packages at once against the key of the identity,
+    imported into a temporary rpm database, returning the ones that failed.
+    """
+    import tempfile
+
+    if not files:
+        return []
+    with tempfile.TemporaryDirectory() as dbpath:
+        key = subprocess.run(
+            ["gpg", "--armor", "--export", identity], capture_output=True, check=True
+        ).stdout
+        with open(os.path.join(dbpath, "key.asc"), "wb") as f:
+            f.write(key)
+        subprocess.check_call(
+            ["rpmkeys", "--dbpath", dbpath, "--import", os.path.join(dbpath, "key.asc")]
+        )
+        proc = subprocess.run(
+            ["rpmkeys", "--dbpath", dbpath, "--checksig"] + files,
+            capture_output=True,
+            text=True,
+        )
+    # every file gets a line like '<path>: digests signatures OK'
+    verified = [
+        line.split(":")[0]
+        for line in proc.stdout.splitlines()
+        if line.endswith("signatures OK")
+    ]
+    return [f for f in files if f not in verified]
+
+
+def write_manifest(args: Arguments, signed, timings, failed):
+    """
+    Record the signed files along with their checksums, signing times and
+    verification results.
+    """
+    import hashlib
+
+    manifest = args.manifest or os.path.join(args.directory, "signing-manifest.json")
+    entries = []
+    for f in sorted(signed):
+        with open(f, "rb") as file:
+            sha256 = hashlib.sha256(file.read()).hexdigest()
+        entries.append(
+            {
+                "file": os.path.basename(f),
+                "sha256": sha256,
+                "seconds": round(timings[f], 3) if f in timings else None,
+                "verified": f not in failed,
+            }
+        )
+    with open(manifest, "w") as f:
+        json.dump({"identity": args.identity, "files": entries}, f, indent=2)
+    print(f"Signing manifest written to {manifest}")
+    if failed:
+        raise Exception(
+            "Couldn't verify the signatures of "
+            + ", ".join(os.path.basename(f) for f in failed)
+        )
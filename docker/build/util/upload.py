@@ -5,11 +5,17 @@ import os
 import re
 import sys
 import json
+import time
+import hashlib
+import threading
 import subprocess
 import argparse
 from dataclasses import dataclass
 from typing import List, Optional
 
+sys.path.append("docker")
+from package.telemetry import telemetry
+
 parser = argparse.ArgumentParser()
 parser.add_argument(
     "--directory",
@@ -43,6 +49,34 @@ parser.add_argument(
     action="store_true",
 )
 parser.set_defaults(test=False)
+parser.add_argument(
+    "--jobs",
+    "-j",
+    help="number of packages to upload concurrently",
+    type=int,
+    default=4,
+)
+parser.add_argument(
+    "--retries",
+    help="number of times a failed upload is retried, with exponential backoff",
+    type=int,
+    default=3,
+)
+parser.add_argument(
+    "--ledger",
+    help="file recording the completed uploads, which are skipped on rerun, "
+    "'upload-ledger.json' in the packages directory by default",
+    type=os.path.abspath,
+)
+parser.add_argument(
+    "--dry-run",
+    help="only print the uploads that would be performed",
+    action="store_true",
+)
+
+# The upload commands can be replaced by local stand-ins, e.g. for testing
+dput_command = os.getenv("DPUT_COMMAND", "execute-dput")
+copr_cli_command = os.getenv("COPR_CLI_COMMAND", "copr-cli")
 
 
 @dataclass
@@ -52,6 +86,10 @@ class Arguments:
     artifacts: List[str]
     destination: str
     test: bool
+    jobs: int = 4
+    retries: int = 3
+    ledger: Optional[str] = None
+    dry_run: bool = False
 
 
 def fill_args(args) -> Arguments:
@@ -61,6 +99,10 @@ def fill_args(args) -> Arguments:
         artifacts=args.artifacts,
         destination=args.upload,
         test=args.test,
+        jobs=args.jobs,
+        retries=args.retries,
+        ledger=args.ledger,
+        dry_run=args.dry_run,
     )
 
 
@@ -83,3 +125,109 @@ def get_artifact_list(args: Arguments):
             filtered.append(x)
 
     return filtered
+
+
+class UploadScheduler:
+    """
+    Runs the uploads with bounded concurrency, retrying the failed ones with
+    exponential backoff. The completed uploads are recorded in an on-disk ledger,
+    keyed by the destination and the checksum of the uploaded file, so that
+    they're skipped when the upload is rerun.
+    """
+
+    def __init__(self, ledger, jobs=4, retries=3, backoff=5, dry_run=False):
+        self.ledger_path = ledger
+        self.jobs = jobs
+        self.retries = retries
+        self.backoff = backoff
+        self.dry_run = dry_run
+        self.lock = threading.Lock()
+        if os.path.exists(ledger):
+            with open(ledger, "r") as f:
+                self.ledger = json.load(f)
+        else:
+            self.ledger = {}
+
+    @staticmethod
+    def upload_key(destination, path):
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return f"{destination}:{os.path.basename(path)}:{h.hexdigest()}"
+
+    def record(self, key, attempts):
+        with self.lock:
+            self.ledger[key] = {"completed_at": time.time(), "attempts": attempts}
+            tmp_path = f"{self.ledger_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.ledger, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.ledger_path)
+
+    def upload(self, key, cmd):
+        if self.dry_run:
+            print(f"Would run: {cmd}")
+            return True
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                delay = self.backoff * 2 ** (attempt - 1)
+                print(f"Retrying in {delay}s: {cmd}")
+                time.sleep(delay)
+            if subprocess.call(cmd, shell=True) == 0:
+                self.record(key, attempt + 1)
+                return True
+        print(f"Giving up after {self.retries + 1} attempts: {cmd}")
+        return False
+
+    def run(self, uploads):
+        """
+        Perform the (destination, path, cmd) uploads, failing if any of them
+        doesn't succeed after the retries.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        pending = []
+        for destination, path, cmd in uploads:
+            key = self.upload_key(destination, path)
+            if key in self.ledger:
+                print(f"Already uploaded to {destination}: {os.path.basename(path)}")
+            else:
+                pending.append((destination, path, key, cmd))
+
+        def timed_upload(destination, path, key, cmd):
+            start = time.monotonic()
+            result = self.upload(key, cmd)
+            if not self.dry_run:
+                telemetry.add(
+                    os.path.basename(path),
+                    f"upload:{destination}",
+                    time.monotonic() - start,
+                    os.path.getsize(path),
+                )
+            return result
+
+        with ThreadPoolExecutor(max(1, self.jobs)) as executor:
+            results = list(executor.map(lambda upload: timed_upload(*upload), pending))
+
+        if self.dry_run:
+            print(
+                f"Uploads: {len(pending)} would be done, "
+                f"{len(uploads) - len(pending)} skipped"
+            )
+            return
+        failed = results.count(False)
+        print(
+            f"Uploads: {len(results) - failed} done, {failed} failed, "
+            f"{len(uploads) - len(pending)} skipped"
+        )
+        if failed:
+            raise Exception(f"{failed} uploads failed.")
+
+
+def make_upload_scheduler(args: Arguments) -> UploadScheduler:
+    return UploadScheduler(
+        args.ledger or os.path.join(args.directory, "upload-ledger.json"),
+        args.jobs,
+        args.retries,
+        dry_run=args.dry_run,
+    )
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2024 Oxhead Alpha
+# SPDX-License-Identifier: LicenseRef-MIT-OA
+
+# This script compares two telemetry reports written by the package builds and
+# flags the stages that got slower or produced bigger outputs than in the previous
+# report. It exits with a non-zero code if there are any regressions.
+#
+# Example:
+# ./docker/compare-telemetry.py previous/telemetry.json out/telemetry.json
+
+import argparse, json, sys
+
+parser = argparse.ArgumentParser()
+parser.add_argument("previous", help="telemetry report of the previous build")
+parser.add_argument("current", help="telemetry report of the current build")
+parser.add_argument(
+    "--threshold",
+    help="relative increase of the time or size of a stage that is a regression",
+    type=float,
+    default=0.2,
+)
+parser.add_argument(
+    "--min-seconds",
+    help="ignore the stages that took less than this in both builds, "
+    "since their timings are mostly noise",
+    type=float,
+    default=5,
+)
+args = parser.parse_args()
+
+
+def load_stages(path):
+    """
+    Return the records of the report keyed by the image, package and stage,
+    summing up the ones for the same key.
+    """
+    with open(path, "r") as f:
+        records = json.load(f)["stages"]
+    stages = {}
+    for record in records:
+        key = (record.get("image"), record["package"], record["stage"])
+        seconds, size = stages.get(key, (0, None))
+        if record["bytes"] is not None:
+            size = (size or 0) + record["bytes"]
+        stages[key] = (seconds + record["seconds"], size)
+    return stages
+
+
+def key_name(key):
+    return "/".join(x for x in key if x is not None)
+
+
+previous = load_stages(args.previous)
+current = load_stages(args.current)
+
+regressions = []
+for key, (seconds, size) in sorted(current.items(), key=lambda x: key_name(x[0])):
+    if key not in previous:
+        continue
+    prev_seconds, prev_size = previous[key]
+    noticeable = max(seconds, prev_seconds) >= args.min_seconds
+    if noticeable and seconds > prev_seconds * (1 + args.threshold):
+        regressions.append(
+            f"{key_name(key)}: {prev_seconds:.1f}s -> {seconds:.1f}s"
+            f" (+{(seconds / prev_seconds - 1) * 100 if prev_seconds else 100:.0f}%)"
+        )
+    if size and prev_size and size > prev_size * (1 + args.threshold):
+        regressions.append(
+            f"{key_name(key)}: {prev_size / 2**20:.1f} MiB -> {size / 2**20:.1f} MiB"
+            f" (+{(size / prev_size - 1) * 100:.0f}%)"
+        )
+
+previous_total = sum(seconds for seconds, _ in previous.values())
+current_total = sum(seconds for seconds, _ in current.values())
+print(f"Total stage time: {previous_total:.1f}s -> {current_total:.1f}s")
+for key in sorted(set(current) - set(previous), key=key_name):
+    print(f"New stage: {key_name(key)}")
+for key in sorted(set(previous) - set(current), key=key_name):
+    print(f"Missing stage: {key_name(key)}")
+
+if regressions:
+    print(f"{len(regressions)} regressions:")
+    for regression in regressions:
+        print(f"  {regression}")
+    sys.exit(1)
+print("No regressions.")
@@ -11,7 +11,7 @@ from typing import Optional, List
 
 from package.package_generator import make_ubuntu_parser
 
-from build.util.build import parser
+from build.util.build import parser, write_telemetry_report
 from build.ubuntu.build import build_ubuntu
 from build.fedora.build import build_fedora
 
@@ -77,15 +77,21 @@ if args.os == "ubuntu":
 elif args.os == "fedora":
     args = parser.parse_args()
 
-artifacts = build_wrapper(args)
+# the report covers the stages up to the failed one if any
+try:
+    artifacts = build_wrapper(args)
 
-if args.gpg_sign:
-    sign_wrapper(sign.Arguments(args.os, args.output_dir, artifacts, args.gpg_sign))
+    if args.gpg_sign:
+        sign_wrapper(sign.Arguments(args.os, args.output_dir, artifacts, args.gpg_sign))
 
-    if args.upload:
-        upload_wrapper(
-            upload.Arguments(args.os, args.output_dir, artifacts, args.upload, False)
-        )
+        if args.upload:
+            upload_wrapper(
+                upload.Arguments(
+                    args.os, args.output_dir, artifacts, args.upload, False
+                )
+            )
 
-elif args.upload:
-    raise Exception("You have to sign packages before uploading them.")
+    elif args.upload:
+        raise Exception("You have to sign packages before uploading them.")
+finally:
+    write_telemetry_report(args)
@@ -0,0 +1,147 @@
+# SPDX-FileCopyrightText: 2024 Oxhead Alpha
+# SPDX-License-Identifier: LicenseRef-MIT-OA
+
+import os
+import shutil
+import hashlib
+
+from .model import TezosBakingServicesPackage
+
+package_dir = os.path.dirname(__file__)
+
+# Sources of the packaging code that can affect the contents of any package
+generator_sources = [
+    "model.py",
+    "systemd.py",
+    "ubuntu.py",
+    "fedora.py",
+    "compression.py",
+    # the build and run dependencies written into the control and spec files
+    "package_generator.py",
+    "scripts/build-binary.sh",
+]
+
+
+def describe(value):
+    """
+    Give a representation of the value that doesn't depend on the run,
+    e.g. on the hash seed used for sets or the addresses of functions.
+    """
+    if isinstance(value, dict):
+        return {str(k): describe(v) for k, v in sorted(value.items())}
+    if isinstance(value, (set, frozenset)):
+        return sorted(map(describe, value), key=repr)
+    if isinstance(value, (list, tuple)):
+        return [describe(x) for x in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if callable(value):
+        return "<callable>"
+    if hasattr(value, "__dict__"):
+        return [type(value).__name__, describe(vars(value))]
+    return repr(value)
+
+
+def update_with_file(h, path):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+
+
+def update_with_tree(h, path):
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for f in sorted(files):
+            file_path = os.path.join(root, f)
+            h.update(os.path.relpath(file_path, path).encode())
+            update_with_file(h, file_path)
+
+
+def package_input_hash(package, build_params, binaries_dir=None, source_archive=None):
+    """
+    Hash everything the artifacts of the package are generated from: its metadata,
+    systemd units, defaults files, scripts, patches, the packaged binary and the
+    build parameters.
+    """
+    h = hashlib.sha256()
+    fields = {k: v for k, v in vars(package).items() if k not in ["source_archive"]}
+    h.update(repr(describe([type(package).__name__, fields, build_params])).encode())
+
+    for source in generator_sources:
+        update_with_file(h, os.path.join(package_dir, source))
+
+    for unit in package.systemd_units:
+        if unit.config_file is not None:
+            update_with_file(h, f"{package_dir}/defaults/{unit.config_file}")
+        for script, script_source in [
+            (unit.startup_script, unit.startup_script_source),
+            (unit.prestart_script, unit.prestart_script_source),
+            (unit.poststop_script, unit.poststop_script_source),
+        ]:
+            if script is not None:
+                source = script if script_source is None else script_source
+                update_with_file(h, f"{package_dir}/scripts/{source}")
+
+    for script in package.additional_scripts:
+        with open(f"{package_dir}/scripts/{script.local_file_name}", "r") as f:
+            h.update(script.transform(f.read()).encode())
+
+    for patch in package.patches:
+        update_with_file(h, f"{package_dir}/patches/{patch}")
+
+    if isinstance(package, TezosBakingServicesPackage):
+        update_with_tree(h, f"{package_dir}/baking")
+
+    if binaries_dir is not None and hasattr(package, "dune_filepath"):
+        binary_name = package.name.replace("tezos", "octez")
+        update_with_file(h, f"{binaries_dir}/{binary_name}")
+
+    if source_archive is not None:
+        update_with_file(h, source_archive)
+
+    return h.hexdigest()
+
+
+class ArtifactsCache:
+    """
+    Cache of the artifacts of the packages keyed by their input hash.
+    """
+
+    def __init__(self, cache_dir, target_os):
+        self.cache_dir = os.path.join(cache_dir, target_os)
+        self.hits = []
+        self.misses = []
+
+    def entry(self, package, key):
+        return os.path.join(self.cache_dir, f"{package.name.lower()}-{key}")
+
+    def restore(self, package, key, dest_dir):
+        entry = self.entry(package, key)
+        if not os.path.isdir(entry):
+            self.misses.append(package.name)
+            return False
+        os.makedirs(dest_dir, exist_ok=True)
+        for f in sorted(os.listdir(entry)):
+            shutil.copy(os.path.join(entry, f), os.path.join(dest_dir, f))
+        self.hits.append(package.name)
+        return True
+
+    def store(self, package, key, artifacts):
+        entry = self.entry(package, key)
+        if os.path.isdir(entry):
+            return
+        # The entry is renamed into place once complete, so that an interrupted
+        # build doesn't leave a partial entry behind
+        tmp_entry = f"{entry}.tmp"
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        os.makedirs(tmp_entry)
+        for artifact in artifacts:
+            shutil.copy(artifact, tmp_entry)
+        os.rename(tmp_entry, entry)
+
+    def report(self):
+        print(f"Artifacts cache hits: {len(self.hits)}, misses: {len(self.misses)}")
+        for name in self.hits:
+            print(f"  hit: {name}")
+        for name in self.misses:
+            print(f"  miss: {name}")
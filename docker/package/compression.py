@@ -0,0 +1,60 @@
+# SPDX-FileCopyrightText: 2024 Oxhead Alpha
+# SPDX-License-Identifier: LicenseRef-MIT-OA
+import os, shutil, subprocess
+
+
+class Codec:
+    """
+    Compression backend for tarballs: the first available of the given compressors
+    is used, each of them has to accept '-d' for decompression like 'tar -I' expects.
+    """
+
+    def __init__(self, name, ext, compressors):
+        self.name = name
+        self.ext = ext
+        self.compressors = compressors
+
+    def program(self):
+        for compressor in self.compressors:
+            if shutil.which(compressor[0]) is not None:
+                return " ".join(compressor)
+        raise Exception(f"No compressor is available for {self.name}.")
+
+
+codecs = {
+    # 'pigz' compresses using all the cores, its output is a regular gzip stream
+    "gzip": Codec("gzip", "tar.gz", [["pigz", "-n"], ["gzip", "-n"]]),
+    "zstd": Codec("zstd", "tar.zst", [["zstd", "-T0", "-q"]]),
+    "xz": Codec("xz", "tar.xz", [["xz", "-T0"]]),
+}
+
+
+def codec_by_ext(path):
+    for codec in codecs.values():
+        if path.endswith(f".{codec.ext}"):
+            return codec
+    raise Exception(f"Unknown compression of {path}.")
+
+
+def create_tarball(archive, paths, cwd, codec="gzip"):
+    """
+    Create the 'archive' tarball with the given paths relative to 'cwd',
+    'codec' is either the name of one of the codecs or a Codec.
+    """
+    if isinstance(codec, str):
+        codec = codecs[codec]
+    subprocess.run(
+        ["tar", "-I", codec.program(), "-cf", archive] + paths,
+        cwd=cwd,
+        check=True,
+    )
+
+
+def extract_tarball(archive, cwd, codec=None):
+    if codec is None:
+        codec = codec_by_ext(archive)
+    subprocess.run(
+        ["tar", "-I", codec.program(), "-xf", archive],
+        cwd=cwd,
+        check=True,
+    )
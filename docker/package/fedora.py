@@ -5,7 +5,80 @@ import os, shutil, subprocess
 from typing import List
 
 from .model import AbstractPackage
-from .systemd import print_service_file
+from .compression import codecs, create_tarball
+from .telemetry import telemetry
+
+
+def run_mock_builds(pkg, srpm, chroots, results_dir, jobs=1, cache_dir=None):
+    """
+    Rebuild the source package in the given mock chroots, running at most 'jobs'
+    builds at once and stopping all of them at the first failure.
+    """
+    import time
+    import platform
+    import threading
+    from .telemetry import path_size
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+    running = []
+    lock = threading.Lock()
+    cancelled = threading.Event()
+    timings = {}
+
+    def mock_build(chroot):
+        arch = chroot.split("-")[-1]
+        cmd = [
+            "mock",
+            # separate build roots for the concurrently built packages
+            f"--uniqueext={pkg.name}",
+            "--resultdir",
+            f"{results_dir}/{chroot}",
+            "-r",
+            f"/etc/mock/{chroot}.cfg",
+        ]
+        if arch != platform.machine():
+            # emulated with qemu-user-static
+            cmd += ["--forcearch", arch]
+        if cache_dir is not None:
+            # the root cache is shared by the builds of all the packages in the chroot
+            cmd += [f"--config-opts=cache_topdir={cache_dir}"]
+        cmd += [srpm]
+        start = time.monotonic()
+        with lock:
+            if cancelled.is_set():
+                return
+            proc = subprocess.Popen(cmd)
+            running.append(proc)
+        exit_code = proc.wait()
+        if exit_code and cancelled.is_set():
+            return
+        timings[chroot] = time.monotonic() - start
+        telemetry.add(
+            pkg.name,
+            f"mock:{chroot}",
+            timings[chroot],
+            path_size(f"{results_dir}/{chroot}"),
+        )
+        if exit_code:
+            raise subprocess.CalledProcessError(exit_code, cmd)
+
+    with ThreadPoolExecutor(max(1, jobs)) as executor:
+        futures = [executor.submit(mock_build, chroot) for chroot in chroots]
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        errors = [f.exception() for f in done if f.exception() is not None]
+        if errors:
+            with lock:
+                cancelled.set()
+                for proc in running:
+                    proc.terminate()
+            for future in futures:
+                future.cancel()
+
+    for chroot in chroots:
+        if chroot in timings:
+            print(f"{pkg.name}: mock build in {chroot} took {timings[chroot]:.1f}s")
+    if errors:
+        raise errors[0]
 
 
 def build_fedora_package(
@@ -15,33 +88,37 @@ def build_fedora_package(
     is_source: bool,
     fedora_versions: List[str],
     binaries_dir: str = None,
+    work_dir: str = None,
+    sources_staging: str = "copy",
+    mock_archs: List[str] = ["x86_64"],
+    mock_jobs: int = 1,
+    mock_cache_dir: str = None,
+    source_compression: str = "gzip",
 ):
+    # All the files are created within 'work_dir', with 'rpmbuild' using
+    # its own top directory there, so that several packages can be built concurrently
+    if work_dir is None:
+        work_dir = os.environ["HOME"]
+    os.makedirs(work_dir, exist_ok=True)
     version = pkg.meta.version.replace("-", "")
     release_version = pkg.meta.release
-    dir = f"{pkg.name}-{version}"
+    dir = os.path.join(work_dir, f"{pkg.name}-{version}")
     cwd = os.path.dirname(__file__)
-    home = os.environ["HOME"]
+    topdir = os.path.join(work_dir, "rpmbuild")
+    rpmbuild = ["rpmbuild", "--define", f"_topdir {topdir}"]
 
-    pkg.fetch_sources(dir, binaries_dir)
-    pkg.gen_buildfile("/".join([dir, pkg.buildfile]), binaries_dir)
+    with telemetry.stage(pkg.name, "fetch-sources", dir):
+        pkg.fetch_sources(dir, binaries_dir, sources_staging)
+        pkg.gen_buildfile("/".join([dir, pkg.buildfile]), None, binaries_dir)
     pkg.gen_license(f"{dir}/LICENSE")
+    pkg.render_systemd_units().write(dir)
     for systemd_unit in pkg.systemd_units:
         # lowercase package name for consistency between different os
         name_lower = pkg.name.lower()
-        if systemd_unit.service_file.service.environment_files is not None:
-            systemd_unit.service_file.service.environment_files = [
-                x.lower() for x in systemd_unit.service_file.service.environment_files
-            ]
         if systemd_unit.suffix is None:
             unit_name = name_lower
         else:
             unit_name = f"{name_lower}-{systemd_unit.suffix}"
-        out_path = (
-            f"{dir}/{unit_name}@.service"
-            if systemd_unit.instances is not None
-            else f"{dir}/{unit_name}.service"
-        )
-        print_service_file(systemd_unit.service_file, out_path)
         if systemd_unit.config_file is not None:
             default_name = (
                 unit_name if systemd_unit.instances is None else f"{unit_name}@"
@@ -70,46 +147,52 @@ def build_fedora_package(
                 with open(dest_path, "w") as dst:
                     dst.write(script.transform(src.read()))
 
-    subprocess.run(["tar", "-czf", f"{dir}.tar.gz", dir], check=True)
-    os.makedirs(f"{home}/rpmbuild/SPECS", exist_ok=True)
-    os.makedirs(f"{home}/rpmbuild/SOURCES", exist_ok=True)
+    source_ext = codecs[source_compression].ext
+    with telemetry.stage(pkg.name, "source-tarball", f"{dir}.{source_ext}"):
+        create_tarball(
+            f"{dir}.{source_ext}", [os.path.basename(dir)], work_dir, source_compression
+        )
+    os.makedirs(f"{topdir}/SPECS", exist_ok=True)
+    os.makedirs(f"{topdir}/SOURCES", exist_ok=True)
     pkg.gen_spec_file(
-        build_deps + run_deps, run_deps, f"{home}/rpmbuild/SPECS/{pkg.name}.spec"
+        build_deps + run_deps,
+        run_deps,
+        f"{topdir}/SPECS/{pkg.name}.spec",
+        source_ext,
     )
-    os.rename(f"{dir}.tar.gz", f"{home}/rpmbuild/SOURCES/{dir}.tar.gz")
+    os.rename(
+        f"{dir}.{source_ext}",
+        f"{topdir}/SOURCES/{os.path.basename(dir)}.{source_ext}",
+    )
+    srpm = f"{topdir}/SRPMS/{pkg.name}-{version}-{release_version}.src.rpm"
+    chroots = []
     for dist in fedora_versions:
         if not is_source and dist == "native":
-            subprocess.run(
-                [
-                    "rpmbuild",
-                    "-bb",
-                    f"{home}/rpmbuild/SPECS/{pkg.name}.spec",
-                ],
-                check=True,
-            )
-        else:
-            subprocess.run(
-                ["rpmbuild", "-bs", f"{home}/rpmbuild/SPECS/{pkg.name}.spec"],
-                check=True,
-            )
-            if not is_source:
-                os.makedirs(f"{home}/rpmbuild/RPMS/x86_64", exist_ok=True)
+            with telemetry.stage(pkg.name, "rpmbuild:native", f"{topdir}/RPMS"):
                 subprocess.run(
-                    [
-                        "mock",
-                        "--resultdir",
-                        f"{home}/rpmbuild/RPMS/x86_64",
-                        "-r",
-                        f"/etc/mock/fedora-{dist}-x86_64.cfg",
-                        f"{home}/rpmbuild/SRPMS/{pkg.name}-{version}-{release_version}.src.rpm",
-                    ],
+                    rpmbuild + ["-bb", f"{topdir}/SPECS/{pkg.name}.spec"],
+                    check=True,
                 )
-                os.rename(
-                    f"{home}/rpmbuild/RPMS/x86_64/{pkg.name}-{version}-{release_version}.x86_64.rpm",
-                    f"{home}/rpmbuild/RPMS/x86_64/{pkg.name}-{version}-{release_version}.fedora-{dist}-x86_64.rpm",
-                )
-                os.remove(
-                    f"{home}/rpmbuild/RPMS/x86_64/{pkg.name}-{version}-{release_version}.src.rpm"
+        elif not os.path.exists(srpm):
+            with telemetry.stage(pkg.name, "rpmbuild:source", srpm):
+                subprocess.run(
+                    rpmbuild + ["-bs", f"{topdir}/SPECS/{pkg.name}.spec"],
+                    check=True,
                 )
+        if not is_source and dist != "native":
+            chroots += [f"fedora-{dist}-{arch}" for arch in mock_archs]
+
+    if chroots:
+        results_dir = f"{topdir}/mock"
+        run_mock_builds(pkg, srpm, chroots, results_dir, mock_jobs, mock_cache_dir)
+        # all the binary packages are gathered in the directory they are collected from
+        os.makedirs(f"{topdir}/RPMS/x86_64", exist_ok=True)
+        for chroot in chroots:
+            arch = chroot.split("-")[-1]
+            os.rename(
+                f"{results_dir}/{chroot}/{pkg.name}-{version}-{release_version}.{arch}.rpm",
+                f"{topdir}/RPMS/x86_64/{pkg.name}-{version}-{release_version}.{chroot}.rpm",
+            )
+        shutil.rmtree(results_dir)
 
-    subprocess.run(f"rm -rf {dir}", shell=True, check=True)
+    shutil.rmtree(dir)
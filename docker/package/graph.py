@@ -0,0 +1,111 @@
+# SPDX-FileCopyrightText: 2024 Oxhead Alpha
+# SPDX-License-Identifier: LicenseRef-MIT-OA
+
+# The packages don't need each other to be built, but they do to be installed, e.g.
+# the bakers require the node and tezos-baking requires both. This models these
+# relationships as a graph to build the packages a package depends on before it,
+# and to select a package along with the packages that depend on it.
+
+from collections import deque
+
+
+class DependencyCycleError(Exception):
+    pass
+
+
+class PackageGraph:
+    """
+    Directed acyclic graph of the packages, with an edge from each package to the
+    packages it depends on, either as native dependencies or through the systemd
+    units its units require.
+    """
+
+    def __init__(self, packages):
+        self.packages = packages
+        self.dependencies = {
+            name: self.package_dependencies(package)
+            for name, package in packages.items()
+        }
+        self.dependents = {name: set() for name in packages}
+        for name, dependencies in self.dependencies.items():
+            for dependency in dependencies:
+                self.dependents[dependency].add(name)
+        # fail early on a cycle rather than when scheduling the builds
+        self.topological_order()
+
+    def unit_owner(self, unit_name):
+        """
+        Return the name of the package shipping the given unit, e.g. 'tezos-node' for
+        'tezos-node-custom@%i.service', or None if it's not shipped by any of them.
+        """
+        unit_name = unit_name.lower()
+        owners = [
+            name
+            for name in self.packages
+            if unit_name.startswith(name.lower() + "-")
+            or unit_name.startswith(name.lower() + "@")
+            or unit_name.startswith(name.lower() + ".")
+        ]
+        return max(owners, key=len, default=None)
+
+    def package_dependencies(self, package):
+        dependencies = set()
+        for dep in getattr(package, "additional_native_deps", []):
+            # some dependencies are given per OS as '{os_name: dependency}'
+            for name in dep.values() if isinstance(dep, dict) else [dep]:
+                if name in self.packages:
+                    dependencies.add(name)
+        # only 'Requires=' is followed, 'After=' and 'PartOf=' also point from the
+        # node to tezos-baking so that stopping the latter stops the former
+        for systemd_unit in getattr(package, "systemd_units", []):
+            for unit_name in systemd_unit.service_file.unit.requires or []:
+                owner = self.unit_owner(unit_name)
+                if owner is not None:
+                    dependencies.add(owner)
+        dependencies.discard(package.name)
+        return dependencies
+
+    def topological_order(self, names=None):
+        """
+        Order the given packages, all of them by default, so that each one comes
+        after the ones it depends on. Ties are broken by name to keep it deterministic.
+        """
+        names = set(self.packages if names is None else names)
+        pending = {name: len(self.dependencies[name] & names) for name in sorted(names)}
+        ready = deque(name for name, count in pending.items() if count == 0)
+        order = []
+        while ready:
+            name = ready.popleft()
+            order.append(name)
+            for dependent in sorted(self.dependents[name] & names):
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    ready.append(dependent)
+        if len(order) != len(names):
+            cycle = sorted(name for name, count in pending.items() if count > 0)
+            raise DependencyCycleError(
+                f"Dependency cycle between the packages: {', '.join(cycle)}"
+            )
+        return order
+
+    def closure(self, names, edges):
+        seen = set(names)
+        stack = list(names)
+        while stack:
+            for name in edges[stack.pop()]:
+                if name not in seen:
+                    seen.add(name)
+                    stack.append(name)
+        return seen
+
+    def with_dependents(self, names):
+        """
+        Return the given packages along with all the packages depending on them.
+        """
+        return self.topological_order(self.closure(names, self.dependents))
+
+    def with_dependencies(self, names):
+        """
+        Return the given packages along with all the packages they depend on.
+        """
+        return self.topological_order(self.closure(names, self.dependencies))
@@ -0,0 +1,208 @@
+# SPDX-FileCopyrightText: 2024 Oxhead Alpha
+# SPDX-License-Identifier: LicenseRef-MIT-OA
+import os, time, hashlib, threading, http.client
+
+from urllib.parse import urljoin, urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+from .telemetry import telemetry
+
+launchpad_url = "https://launchpad.net"
+
+
+class DownloadError(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Keep-alive connections reused by the downloads, per host since Launchpad
+    redirects the source files to its librarian.
+    """
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+        self.idle_connections = {}
+        self.lock = threading.Lock()
+
+    def new_connection(self, scheme, netloc):
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def request(self, url, out=None, max_redirects=5):
+        """
+        Return the body of the response to a GET request of the url,
+        or write it to 'out' if given. Return None if there is no such file.
+        """
+        for _ in range(max_redirects + 1):
+            parsed = urlparse(url)
+            key = (parsed.scheme, parsed.netloc)
+            path = parsed.path + (f"?{parsed.query}" if parsed.query else "")
+            with self.lock:
+                idle = self.idle_connections.get(key, [])
+                conn = idle.pop() if idle else None
+            reused = conn is not None
+            if conn is None:
+                conn = self.new_connection(*key)
+            try:
+                try:
+                    response = self.get(conn, path)
+                except (http.client.HTTPException, OSError):
+                    conn.close()
+                    if not reused:
+                        raise
+                    # the server might have closed an idle keep-alive connection
+                    conn = self.new_connection(*key)
+                    response = self.get(conn, path)
+                if response.status in [301, 302, 303, 307, 308]:
+                    response.read()
+                    url = urljoin(url, response.getheader("Location"))
+                    result = "redirect"
+                elif response.status == 404:
+                    response.read()
+                    result = None
+                elif response.status != 200:
+                    raise DownloadError(f"{url}: {response.status} {response.reason}")
+                elif out is None:
+                    result = response.read()
+                else:
+                    for chunk in iter(lambda: response.read(1 << 20), b""):
+                        out.write(chunk)
+                    result = True
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                raise DownloadError(f"{url}: {e}")
+            with self.lock:
+                self.idle_connections.setdefault(key, []).append(conn)
+            if result != "redirect":
+                return result
+        raise DownloadError(f"{url}: too many redirects")
+
+    def get(self, conn, path):
+        conn.request("GET", path, headers={"User-Agent": "tezos-packaging"})
+        return conn.getresponse()
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle_connections.values():
+                for conn in connections:
+                    conn.close()
+            self.idle_connections = {}
+
+
+def sha256sum(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def parse_dsc_checksums(dsc):
+    """
+    Return the sha256 and size of each file listed in the .dsc file.
+    """
+    checksums = {}
+    lines = dsc.decode(errors="replace").splitlines()
+    in_section = False
+    for line in lines:
+        if line.startswith("Checksums-Sha256:"):
+            in_section = True
+        elif in_section and line.startswith(" "):
+            sha256, size, name = line.split()
+            checksums[name] = (sha256, int(size))
+        else:
+            in_section = False
+    return checksums
+
+
+class LaunchpadSources:
+    """
+    Downloads the '.orig.tar.gz' archives of the packages published on Launchpad into
+    'cache_dir', where they're kept under their package name and version. The archives
+    are verified against the checksums from the '.dsc' files they're published with.
+    """
+
+    def __init__(self, cache_dir, distributions, base_url=launchpad_url, jobs=8):
+        self.cache_dir = cache_dir
+        self.distributions = distributions
+        self.base_url = base_url.rstrip("/")
+        self.jobs = jobs
+        self.pool = ConnectionPool()
+
+    def sources_url(self, name, version, dist):
+        repo = "tezos-rc" if "rc" in version or "beta" in version else "tezos"
+        return (
+            f"{self.base_url}/~serokell/+archive/ubuntu/{repo}/+sourcefiles/"
+            f"{name}/2:{version}-0ubuntu1~{dist}"
+        )
+
+    def fetch(self, name, version):
+        """
+        Return the path to the verified source archive of the package, fetching it
+        from the first distribution it's published for unless it's already cached.
+        """
+        archive_name = f"{name}_{version}.orig.tar.gz"
+        archive = os.path.join(self.cache_dir, archive_name)
+        checksum_file = f"{archive}.sha256"
+        if os.path.exists(archive) and os.path.exists(checksum_file):
+            with open(checksum_file, "r") as f:
+                if f.read().strip() == sha256sum(archive):
+                    print(f"{name} source is already downloaded")
+                    return archive
+
+        for dist in self.distributions:
+            url = self.sources_url(name, version, dist)
+            dsc = self.pool.request(f"{url}/{name}_{version}-0ubuntu1~{dist}.dsc")
+            if dsc is None:
+                continue
+            expected = parse_dsc_checksums(dsc).get(archive_name)
+            if expected is None:
+                raise DownloadError(
+                    f"{archive_name} isn't listed in the .dsc for {dist}"
+                )
+            tmp_archive = f"{archive}.{threading.get_ident()}.tmp"
+            with open(tmp_archive, "wb") as f:
+                found = self.pool.request(f"{url}/{archive_name}", f)
+            if not found:
+                os.remove(tmp_archive)
+                continue
+            sha256, size = sha256sum(tmp_archive), os.path.getsize(tmp_archive)
+            if (sha256, size) != expected:
+                os.remove(tmp_archive)
+                raise DownloadError(
+                    f"{archive_name} from {dist} doesn't match its checksum"
+                )
+            os.replace(tmp_archive, archive)
+            with open(checksum_file, "w") as f:
+                f.write(sha256)
+            print(f"{name} source was downloaded successfully")
+            return archive
+        return None
+
+    def fetch_all(self, packages):
+        """
+        Fetch the sources of the (name, version) packages concurrently, returning
+        the paths to the archives, None for the ones that aren't available.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        def fetch(package):
+            start = time.monotonic()
+            try:
+                archive = self.fetch(*package)
+            except DownloadError as e:
+                print(f"ERROR: {e}")
+                archive = None
+            size = os.path.getsize(archive) if archive is not None else None
+            telemetry.add(
+                package[0], "launchpad-sources", time.monotonic() - start, size
+            )
+            return archive
+
+        try:
+            with ThreadPoolExecutor(max(1, min(self.jobs, len(packages)))) as executor:
+                return list(executor.map(fetch, packages))
+        finally:
+            self.pool.close()
@@ -5,9 +5,10 @@ import os, subprocess
 import re
 import shutil
 import stat
+import time
 from copy import deepcopy
 from abc import abstractmethod
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from typing import List, Dict, Callable, Optional
 
 from .meta import PackagesMeta
@@ -17,9 +18,71 @@ from .systemd import (
     ServiceFile,
     SystemdUnit,
     Unit,
+    render_service_files,
 )
 
 
+# Ways to stage the shared sources into the package directories, in the order
+# in which they're tried in the "auto" mode.
+# "reflink" creates copy-on-write clones, which requires a filesystem supporting them.
+# "hardlink" creates a farm of hard links to the shared files, which requires the
+# staged directory to be on the same filesystem. The build only creates new files
+# in the source tree (e.g. '_build' and '_opam'), so the shared files aren't modified.
+# "copy" fully copies the sources.
+sources_staging_modes = ["reflink", "hardlink", "copy"]
+
+
+def tree_size(path):
+    size = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            file_path = os.path.join(root, f)
+            if not os.path.islink(file_path):
+                size += os.path.getsize(file_path)
+    return size
+
+
+def stage_tree(src, dst, mode):
+    """
+    Stage the 'src' directory at 'dst' using the given staging mode, falling back
+    to the next modes in case of failure in the "auto" mode or when a list of modes
+    is given. Log the time spent and the number of bytes that didn't have to be copied.
+    """
+    if mode == "auto":
+        modes = sources_staging_modes
+    else:
+        modes = mode if isinstance(mode, list) else [mode]
+    src = os.path.normpath(src)
+    for i, staging_mode in enumerate(modes):
+        start = time.monotonic()
+        try:
+            if staging_mode == "reflink":
+                subprocess.run(
+                    ["cp", "-a", "--reflink=always", src, dst],
+                    check=True,
+                    capture_output=True,
+                )
+            elif staging_mode == "hardlink":
+                shutil.copytree(src, dst, copy_function=os.link)
+            else:
+                shutil.copytree(src, dst)
+        except (subprocess.CalledProcessError, OSError) as e:
+            if i + 1 == len(modes):
+                raise
+            if isinstance(e, subprocess.CalledProcessError):
+                e = e.stderr.decode().strip()
+            print(f"Couldn't stage {src} using {staging_mode}, falling back: {e}")
+            shutil.rmtree(dst, ignore_errors=True)
+            continue
+        elapsed = time.monotonic() - start
+        saved = 0 if staging_mode == "copy" else tree_size(dst)
+        print(
+            f"Staged {src} into {dst} using {staging_mode} in {elapsed:.1f}s, "
+            f"{saved} bytes saved"
+        )
+        return
+
+
 @dataclass
 class AdditionalScript:
     local_file_name: str
@@ -29,42 +92,123 @@ class AdditionalScript:
     transform: Callable[[str], str] = field(default_factory=lambda x: x)
 
 
+def write_file(out, contents):
+    # the generators render None for the files the package doesn't have
+    if contents is not None:
+        with open(out, "w") as f:
+            f.write(contents)
+
+
+class FileTree:
+    """
+    Virtual file tree the packaging files are rendered into, mapping their paths
+    relative to the root of the tree to their contents, so that they can be generated
+    without an actual source tree and written to disk separately.
+    """
+
+    def __init__(self):
+        self.files = {}
+
+    def add(self, path, contents):
+        if contents is not None:
+            self.files[path] = contents
+
+    def update(self, tree, prefix=""):
+        for path, contents in tree.files.items():
+            self.files[os.path.join(prefix, path)] = contents
+
+    def subtree(self, prefix):
+        """
+        Return the files under the 'prefix' directory, relative to it.
+        """
+        tree = FileTree()
+        for path, contents in self.files.items():
+            if path.startswith(prefix + "/"):
+                tree.files[path[len(prefix) + 1 :]] = contents
+        return tree
+
+    def write(self, root):
+        for path, contents in self.files.items():
+            out = os.path.join(root, path)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            write_file(out, contents)
+
+    def diff(self, golden_dir):
+        """
+        Return the unified diff between the files in 'golden_dir' and the tree,
+        including the files that are only in one of them.
+        """
+        import difflib
+
+        golden_files = set()
+        for root, _, files in os.walk(golden_dir):
+            for f in files:
+                golden_files.add(os.path.relpath(os.path.join(root, f), golden_dir))
+        diff = []
+        for path in sorted(golden_files | set(self.files)):
+            expected = []
+            if path in golden_files:
+                with open(os.path.join(golden_dir, path), "r") as f:
+                    expected = f.read().splitlines(keepends=True)
+            rendered = self.files.get(path, "").splitlines(keepends=True)
+            for line in difflib.unified_diff(
+                expected, rendered, f"golden/{path}", f"rendered/{path}"
+            ):
+                diff.append(line if line.endswith("\n") else f"{line}\n")
+        return "".join(diff)
+
+
 class AbstractPackage:
 
     buildfile = "Makefile"
 
     additional_scripts: List[AdditionalScript] = []
 
+    # The 'render_*' methods return the contents of the packaging files, which
+    # the corresponding 'gen_*' methods write to the 'out' path
     @abstractmethod
-    def fetch_sources(self, out_dir, binaries_dir=None):
+    def fetch_sources(self, out_dir, binaries_dir=None, sources_staging="copy"):
         pass
 
     @abstractmethod
-    def gen_control_file(self, out):
+    def render_control_file(self, build_deps, run_deps, ubuntu_version):
         pass
 
+    def gen_control_file(self, build_deps, run_deps, ubuntu_version, out):
+        write_file(out, self.render_control_file(build_deps, run_deps, ubuntu_version))
+
     @abstractmethod
-    def get_spec_file(self, out):
+    def render_spec_file(self, build_deps, run_deps, source_ext="tar.gz"):
         pass
 
+    def gen_spec_file(self, build_deps, run_deps, out, source_ext="tar.gz"):
+        write_file(out, self.render_spec_file(build_deps, run_deps, source_ext))
+
     @abstractmethod
-    def gen_buildfile(self, out, ubuntu_version, binaries_dir=None):
+    def render_buildfile(self, ubuntu_version, binaries_dir=None):
         pass
 
-    def gen_changelog(self, ubuntu_version, maintainer, date, out):
-        changelog_contents = f"""{self.name.lower()} ({self.meta.ubuntu_epoch}:{self.meta.version}-0ubuntu{self.meta.release}~{ubuntu_version}) {ubuntu_version}; urgency=medium
+    def gen_buildfile(self, out, ubuntu_version, binaries_dir=None):
+        write_file(out, self.render_buildfile(ubuntu_version, binaries_dir))
+
+    def render_changelog(self, ubuntu_version, maintainer, date):
+        return f"""{self.name.lower()} ({self.meta.ubuntu_epoch}:{self.meta.version}-0ubuntu{self.meta.release}~{ubuntu_version}) {ubuntu_version}; urgency=medium
 
   * Publish {self.meta.version}-{self.meta.release} version of {self.name}
 
  -- {maintainer} {date}"""
-        with open(out, "w") as f:
-            f.write(changelog_contents)
+
+    def gen_changelog(self, ubuntu_version, maintainer, date, out):
+        write_file(out, self.render_changelog(ubuntu_version, maintainer, date))
 
     @abstractmethod
-    def gen_rules(self, out, ubuntu_version, binaries_dir=None):
+    def render_rules(self, ubuntu_version, static_binaries=False):
         pass
 
-    def gen_install(self, out):
+    def gen_rules(self, out, ubuntu_version, static_binaries=False):
+        write_file(out, self.render_rules(ubuntu_version, static_binaries))
+
+    def render_install(self):
         scripts = set()
         for unit in self.systemd_units:
             for script in [
@@ -76,35 +220,91 @@ class AbstractPackage:
                     scripts.add(script)
         scripts |= set(map(lambda x: x.name, self.additional_scripts))
         if len(scripts) > 0:
-            install_contents = "\n".join([f"debian/{x} usr/bin" for x in scripts])
-            with open(out, "w") as f:
-                f.write(install_contents)
+            return "\n".join([f"debian/{x} usr/bin" for x in sorted(scripts)])
+
+    def gen_install(self, out):
+        write_file(out, self.render_install())
+
+    def render_links(self):
+        return "\n".join(
+            [
+                f"/usr/bin/{x.name} /usr/bin/{x.symlink_name}"
+                for x in self.additional_scripts
+                if x.symlink_name is not None
+            ]
+        )
 
     def gen_links(self, out):
-        with open(out, "w") as f:
-            f.write(
-                "\n".join(
-                    [
-                        f"/usr/bin/{x.name} /usr/bin/{x.symlink_name}"
-                        for x in self.additional_scripts
-                        if x.symlink_name is not None
-                    ]
-                )
-            )
+        write_file(out, self.render_links())
 
     @abstractmethod
-    def gen_postinst(self, out):
+    def render_postinst(self):
         pass
 
+    def gen_postinst(self, out):
+        write_file(out, self.render_postinst())
+
     @abstractmethod
-    def gen_postrm(self, out):
+    def render_postrm(self):
         pass
 
+    def gen_postrm(self, out):
+        write_file(out, self.render_postrm())
+
+    def systemd_service_files(self):
+        """
+        Return the service files of the package keyed by their names.
+        """
+        service_files = {}
+        for systemd_unit in self.systemd_units:
+            service_file = systemd_unit.service_file
+            environment_files = service_file.service.environment_files
+            if environment_files is not None:
+                # lowercase package name for consistency between different os
+                service = replace(
+                    service_file.service,
+                    environment_files=[x.lower() for x in environment_files],
+                )
+                service_file = replace(service_file, service=service)
+            if systemd_unit.suffix is None:
+                unit_name = self.name.lower()
+            else:
+                unit_name = f"{self.name.lower()}-{systemd_unit.suffix}"
+            if systemd_unit.instances is not None:
+                unit_name = f"{unit_name}@"
+            service_files[f"{unit_name}.service"] = service_file
+        return service_files
+
+    def render_systemd_units(self):
+        """
+        Render the service files of the package into a tree keyed by their names.
+        """
+        tree = FileTree()
+        rendered = render_service_files(self.systemd_service_files())
+        for name, contents in rendered.items():
+            tree.add(name, contents)
+        return tree
+
     @abstractmethod
     def gen_license(self, out):
         pass
 
 
+def render_packages_systemd_units(packages):
+    """
+    Render the units of all the packages in a single batch, which reports all the
+    invalid ones at once, into a tree laid out as '<package>/<unit>'.
+    """
+    service_files = {}
+    for package in packages:
+        for name, service_file in package.systemd_service_files().items():
+            service_files[f"{package.name}/{name}"] = service_file
+    tree = FileTree()
+    for path, contents in render_service_files(service_files).items():
+        tree.add(path, contents)
+    return tree
+
+
 def gen_spec_systemd_part(package):
     systemd_units = package.systemd_units
     scripts = set()
@@ -150,7 +350,7 @@ def gen_spec_systemd_part(package):
             default_files += f"%{{_sysconfdir}}/default/{service_name}\n"
     install_startup_scripts = ""
     systemd_startup_files = ""
-    for script in scripts:
+    for script in sorted(scripts):
         if script is not None:
             install_startup_scripts += (
                 f"install -m 0755 {script} %{{buildroot}}/%{{_bindir}}\n"
@@ -194,7 +394,7 @@ def mk_dh_flags(package):
     )
 
 
-def gen_systemd_rules_contents(package, ubuntu_version, binaries_dir=None):
+def gen_systemd_rules_contents(package, ubuntu_version, static_binaries=False):
     package_name = package.name.lower()
     units = set()
     for systemd_unit in package.systemd_units:
@@ -210,24 +410,26 @@ def gen_systemd_rules_contents(package, ubuntu_version, binaries_dir=None):
                 unit_name = f"{package_name}@"
         units.add(unit_name)
     override_dh_install_init = "override_dh_installinit:\n" + "\n".join(
-        f"	dh_installinit --name={unit_name}" for unit_name in units
+        f"	dh_installinit --name={unit_name}" for unit_name in sorted(units)
     )
     override_dh_auto_install = (
         "override_dh_auto_install:\n"
         + "	dh_auto_install\n"
         + "\n".join(
             f"	dh_installsystemd --no-enable --no-start --name={unit_name} {unit_name}.service"
-            for unit_name in units
+            for unit_name in sorted(units)
         )
     )
     splice_if = lambda cond: lambda string: string if cond else ""
     is_pybuild = package.buildfile == "setup.py"
     pybuild_splice = splice_if(is_pybuild)
+    # the prebuilt static binaries are packaged as they are, while the ones built
+    # in the container, even all at once with '--build-once', are stripped
     rules_contents = f"""#!/usr/bin/make -f
 # Disable usage of instructions from the ADX extension to avoid incompatibility
 # with old CPUs, see https://gitlab.com/dannywillems/ocaml-bls12-381/-/merge_requests/135/
 export BLST_PORTABLE=yes
-{splice_if(binaries_dir)("export DEB_BUILD_OPTIONS=nostrip")}
+{splice_if(static_binaries)("export DEB_BUILD_OPTIONS=nostrip")}
 {pybuild_splice(f'''
 export PYBUILD_NAME={package_name}
 export PYBUILD_INTERPRETERS=python3
@@ -287,23 +489,24 @@ class TezosBinaryPackage(AbstractPackage):
             if isinstance(x, str) or (isinstance(x, dict) and os_name in x.keys())
         ]
 
-    def fetch_sources(self, out_dir, binaries_dir=None):
+    def fetch_sources(self, out_dir, binaries_dir=None, sources_staging="copy"):
         cwd = os.path.dirname(__file__)
         os.makedirs(out_dir)
-        os.chdir(out_dir)
 
         # We'll be using the pre-built binaries as source.
         if binaries_dir:
             binary_name = self.name.replace("tezos", "octez")
-            shutil.copy(f"{binaries_dir}/{binary_name}", binary_name)
+            shutil.copy(f"{binaries_dir}/{binary_name}", f"{out_dir}/{binary_name}")
         else:
-            shutil.copytree(f"{cwd}/../sources/tezos", "tezos")
-            shutil.copytree(f"{cwd}/../sources/opam-repository", "opam-repository")
-            shutil.copy(f"{cwd}/scripts/build-binary.sh", "build-binary.sh")
-
-        os.chdir("..")
+            stage_tree(f"{cwd}/../sources/tezos", f"{out_dir}/tezos", sources_staging)
+            stage_tree(
+                f"{cwd}/../sources/opam-repository",
+                f"{out_dir}/opam-repository",
+                sources_staging,
+            )
+            shutil.copy(f"{cwd}/scripts/build-binary.sh", f"{out_dir}/build-binary.sh")
 
-    def gen_control_file(self, build_deps, run_deps, ubuntu_version, out):
+    def render_control_file(self, build_deps, run_deps, ubuntu_version):
         str_run_deps = ", ".join(
             run_deps + self.__get_os_specific_native_deps("ubuntu")
         )
@@ -322,10 +525,9 @@ Architecture: amd64 arm64
 Depends: ${{shlibs:Depends}}, ${{misc:Depends}}, {str_run_deps}
 Description: {self.desc}
 """
-        with open(out, "w") as f:
-            f.write(file_contents)
+        return file_contents
 
-    def gen_spec_file(self, build_deps, run_deps, out):
+    def render_spec_file(self, build_deps, run_deps, source_ext="tar.gz"):
         binary_name = self.name.replace("tezos", "octez")
         build_requires = " ".join(build_deps)
         requires = " ".join(run_deps)
@@ -377,7 +579,7 @@ Epoch: {self.meta.fedora_epoch}
 Summary: {self.desc}
 License: MIT
 BuildArch: x86_64 aarch64
-Source0: {self.name}-{version}.tar.gz
+Source0: {self.name}-{version}.{source_ext}
 Source1: https://gitlab.com/tezos/tezos/tree/v{self.meta.version}/
 BuildRequires: {build_requires} {systemd_deps}
 Requires: {requires}, {str_additional_native_deps}
@@ -403,10 +605,9 @@ ln -s %{{_bindir}}/{binary_name} %{{buildroot}}/%{{_bindir}}/{self.name}
 {systemd_files}
 {systemd_macros}
 """
-        with open(out, "w") as f:
-            f.write(file_contents)
+        return file_contents
 
-    def gen_buildfile(self, out, ubuntu_version, binaries_dir=None):
+    def render_buildfile(self, ubuntu_version, binaries_dir=None):
         binary_name = self.name.replace("tezos", "octez")
         makefile_contents = f"""
 .PHONY: install
@@ -424,15 +625,12 @@ install: {binary_name}
 	cp $(CURDIR)/{binary_name} $(DESTDIR)$(BINDIR)
 	ln -s $(BINDIR)/{binary_name} $(DESTDIR)$(BINDIR)/{self.name}
 """
-        with open(out, "w") as f:
-            f.write(makefile_contents)
+        return makefile_contents
 
-    def gen_rules(self, out, ubuntu_version, binaries_dir=None):
-        rules_contents = gen_systemd_rules_contents(self, ubuntu_version, binaries_dir)
-        with open(out, "w") as f:
-            f.write(rules_contents)
+    def render_rules(self, ubuntu_version, static_binaries=False):
+        return gen_systemd_rules_contents(self, ubuntu_version, static_binaries)
 
-    def gen_postinst(self, out):
+    def render_postinst(self):
         postinst_contents = f"""#!/bin/sh
 
 set -e
@@ -442,10 +640,9 @@ set -e
 {self.postinst_steps}
 """
         postinst_contents = postinst_contents.replace(self.name, self.name.lower())
-        with open(out, "w") as f:
-            f.write(postinst_contents)
+        return postinst_contents
 
-    def gen_postrm(self, out):
+    def render_postrm(self):
         postrm_contents = f"""#!/bin/sh
 
 set -e
@@ -455,8 +652,7 @@ set -e
 {self.postrm_steps}
 """
         postrm_contents = postrm_contents.replace(self.name, self.name.lower())
-        with open(out, "w") as f:
-            f.write(postrm_contents)
+        return postrm_contents
 
     def gen_license(self, out):
         subprocess.run(
@@ -471,6 +667,28 @@ set -e
         )
 
 
+def build_binaries(packages, out_dir, sources_staging="copy"):
+    """
+    Build the binaries of all the given packages within a single dune invocation,
+    placing them in 'out_dir' under the names expected by 'fetch_sources'.
+    """
+    cwd = os.path.dirname(__file__)
+    os.makedirs(out_dir)
+    stage_tree(f"{cwd}/../sources/tezos", f"{out_dir}/tezos", sources_staging)
+    stage_tree(
+        f"{cwd}/../sources/opam-repository",
+        f"{out_dir}/opam-repository",
+        sources_staging,
+    )
+    shutil.copy(f"{cwd}/scripts/build-binary.sh", f"{out_dir}/build-binary.sh")
+    targets = []
+    for package in packages:
+        targets += [package.dune_filepath, package.name.replace("tezos", "octez")]
+    start = time.monotonic()
+    subprocess.run(["./build-binary.sh"] + targets, cwd=out_dir, check=True)
+    print(f"Built {len(packages)} binaries at once in {time.monotonic() - start:.1f}s")
+
+
 class TezosSaplingParamsPackage(AbstractPackage):
     def __init__(self, meta: PackagesMeta, params_revision: str):
         self.name = "tezos-sapling-params"
@@ -481,7 +699,7 @@ class TezosSaplingParamsPackage(AbstractPackage):
         self.params_revision = params_revision
         self.patches = []
 
-    def fetch_sources(self, out_dir, binaries_dir=None):
+    def fetch_sources(self, out_dir, binaries_dir=None, sources_staging="copy"):
         os.makedirs(out_dir)
         subprocess.run(
             [
@@ -500,7 +718,7 @@ class TezosSaplingParamsPackage(AbstractPackage):
             ]
         )
 
-    def gen_control_file(self, build_deps, run_deps, ubuntu_version, out):
+    def render_control_file(self, build_deps, run_deps, ubuntu_version):
         file_contents = f"""
 Source: {self.name}
 Section: utils
@@ -515,10 +733,9 @@ Architecture: amd64 arm64
 Depends: ${{shlibs:Depends}}, ${{misc:Depends}}
 Description: {self.desc}
 """
-        with open(out, "w") as f:
-            f.write(file_contents)
+        return file_contents
 
-    def gen_spec_file(self, build_deps, run_deps, out):
+    def render_spec_file(self, build_deps, run_deps, source_ext="tar.gz"):
         version = self.meta.version.replace("-", "")
         file_contents = f"""
 %define debug_package %{{nil}}
@@ -529,7 +746,7 @@ Epoch: {self.meta.fedora_epoch}
 Summary: {self.desc}
 License: MIT
 BuildArch: x86_64 aarch64
-Source0: {self.name}-{version}.tar.gz
+Source0: {self.name}-{version}.{source_ext}
 BuildRequires: wget
 %description
 {self.desc}
@@ -547,10 +764,9 @@ install -m 0755 sapling-output.params %{{buildroot}}/%{{_datadir}}/zcash-params
 %{{_datadir}}/zcash-params/sapling-spend.params
 %{{_datadir}}/zcash-params/sapling-output.params
 """
-        with open(out, "w") as f:
-            f.write(file_contents)
+        return file_contents
 
-    def gen_buildfile(self, out, ubuntu_version, binaries_dir=None):
+    def render_buildfile(self, ubuntu_version, binaries_dir=None):
         file_contents = """
 .PHONY: install
 
@@ -563,17 +779,15 @@ install: tezos-sapling-params
 	cp $(CURDIR)/sapling-spend.params $(DESTDIR)$(DATADIR)
 	cp $(CURDIR)/sapling-output.params $(DESTDIR)$(DATADIR)
 """
-        with open(out, "w") as f:
-            f.write(file_contents)
+        return file_contents
 
-    def gen_rules(self, out, ubuntu_version, binaries_dir=None):
+    def render_rules(self, ubuntu_version, static_binaries=False):
         rules_contents = """#!/usr/bin/make -f
 
 %:
 	dh $@
 """
-        with open(out, "w") as f:
-            f.write(rules_contents)
+        return rules_contents
 
     def gen_license(self, out):
         shutil.copy(f"{os.path.dirname(__file__)}/../../LICENSE", out)
@@ -679,13 +893,13 @@ class TezosBakingServicesPackage(AbstractPackage):
         self.postinst_steps = ""
         self.postrm_steps = ""
 
-    def fetch_sources(self, out_dir, binaries_dir=None):
+    def fetch_sources(self, out_dir, binaries_dir=None, sources_staging="copy"):
         os.makedirs(out_dir)
         shutil.copytree(
             f"{os.path.dirname(__file__)}/baking/", out_dir, dirs_exist_ok=True
         )
 
-    def gen_control_file(self, build_deps, run_deps, ubuntu_version, out):
+    def render_control_file(self, build_deps, run_deps, ubuntu_version):
         native_run_deps_list = [x.lower() for x in self.additional_native_deps]
         str_run_deps = ", ".join(run_deps + native_run_deps_list)
         file_contents = f"""
@@ -703,10 +917,9 @@ Architecture: amd64 arm64
 Depends: ${{shlibs:Depends}}, ${{misc:Depends}}, {str_run_deps}, ${{python3:Depends}}
 Description: {self.desc}
 """
-        with open(out, "w") as f:
-            f.write(file_contents)
+        return file_contents
 
-    def gen_spec_file(self, build_deps, run_deps, out):
+    def render_spec_file(self, build_deps, run_deps, source_ext="tar.gz"):
         run_deps = ", ".join(self.additional_native_deps)
         (
             systemd_deps,
@@ -724,7 +937,7 @@ Epoch: {self.meta.fedora_epoch}
 Summary: {self.desc}
 License: MIT
 BuildArch: x86_64 aarch64
-Source0: {self.name}-{version}.tar.gz
+Source0: {self.name}-{version}.{source_ext}
 Source1: https://gitlab.com/tezos/tezos/tree/v{self.meta.version}/
 BuildRequires: {systemd_deps}, python3-devel, python3-setuptools, python3-wheel, python3-tox-current-env
 Requires: {run_deps}
@@ -757,10 +970,9 @@ Maintainer: {self.meta.maintainer}
 {systemd_files}
 {systemd_macros}
 """
-        with open(out, "w") as f:
-            f.write(file_contents)
+        return file_contents
 
-    def gen_buildfile(self, out, ubuntu_version, binaries_dir=None):
+    def render_buildfile(self, ubuntu_version, binaries_dir=None):
         # ubuntu focal release does not support `pybuild-plugin-pyproject`
         # so that we still need that file for compatibility
         # actual configuration is supplied by `setup.cfg`
@@ -769,18 +981,15 @@ from setuptools import setup
 
 setup()
 """
-        with open(out, "w") as f:
-            f.write(file_contents)
+        return file_contents
 
-    def gen_rules(self, out, ubuntu_version, binaries_dir=None):
-        rules_contents = gen_systemd_rules_contents(self, ubuntu_version)
-        with open(out, "w") as f:
-            f.write(rules_contents)
+    def render_rules(self, ubuntu_version, static_binaries=False):
+        return gen_systemd_rules_contents(self, ubuntu_version)
 
     def gen_license(self, out):
         shutil.copy(f"{os.path.dirname(__file__)}/../../LICENSE", out)
 
-    def gen_postinst(self, out):
+    def render_postinst(self):
         postinst_contents = f"""#!/bin/sh
 
 set -e
@@ -790,5 +999,4 @@ set -e
 {self.postinst_steps}
 """
         postinst_contents = postinst_contents.replace(self.name, self.name.lower())
-        with open(out, "w") as f:
-            f.write(postinst_contents)
+        return postinst_contents
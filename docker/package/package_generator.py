@@ -6,14 +6,18 @@ import sys
 import json
 import shutil
 import argparse
-import urllib.request
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from .fedora import build_fedora_package
 from .ubuntu import build_ubuntu_package
 from .packages import packages as all_packages
-from .model import TezosBinaryPackage
+from .model import TezosBinaryPackage, build_binaries, sources_staging_modes
+from .graph import PackageGraph
+from .telemetry import telemetry
 
 # fixed output dir in container
 output_dir = "out"
+# each package is built in its own subdirectory here
+scratch_dir = "scratch"
 
 common_parser = argparse.ArgumentParser()
 common_parser.add_argument("--os", choices=["ubuntu", "fedora"])
@@ -37,6 +41,58 @@ common_parser.add_argument(
     help="provide a directory with exiting prebuilt binaries",
     type=os.path.abspath,
 )
+common_parser.add_argument(
+    "-j",
+    "--jobs",
+    help="number of packages to build concurrently",
+    type=int,
+    default=1,
+)
+common_parser.add_argument(
+    "--sources-staging",
+    help="how to stage the shared sources for each package built from them, "
+    "'auto' tries the modes in the listed order",
+    choices=["auto"] + sources_staging_modes,
+    default="auto",
+)
+common_parser.add_argument(
+    "--cache-dir",
+    help="directory to cache the artifacts in, packages with unchanged inputs "
+    "are restored from it instead of being built",
+    type=os.path.abspath,
+)
+common_parser.add_argument(
+    "--mock-jobs",
+    help="number of mock builds for different chroots to run concurrently for a fedora package",
+    type=int,
+    default=1,
+)
+common_parser.add_argument(
+    "--mock-archs",
+    help="architectures to build fedora packages for with mock, "
+    "the ones differing from the host are emulated",
+    nargs="+",
+    choices=["x86_64", "aarch64"],
+    default=["x86_64"],
+)
+common_parser.add_argument(
+    "--source-compression",
+    help="compression of the source tarballs of fedora packages, "
+    "ubuntu ones are always compressed with gzip as '.orig.tar.gz' requires",
+    choices=["gzip", "zstd", "xz"],
+    default="gzip",
+)
+common_parser.add_argument(
+    "--build-once",
+    help="build all the binaries within a single dune invocation and package "
+    "the prebuilt binaries, source packages are still built from source",
+    action="store_true",
+)
+common_parser.add_argument(
+    "--with-dependents",
+    help="also build the packages depending on the specified ones",
+    action="store_true",
+)
 
 
 def make_ubuntu_parser(parser):
@@ -51,6 +107,11 @@ def make_ubuntu_parser(parser):
         action="store_true",
     )
     parser.set_defaults(launchpad_sources=False)
+    parser.add_argument(
+        "--launchpad-url",
+        help="base url to download the sources from with '--launchpad-sources'",
+        default="https://launchpad.net",
+    )
 
     return parser
 
@@ -122,6 +183,214 @@ def get_build_deps(binaries_dir, extra_deps=[]):
     ] + extra_deps
 
 
+def package_scratch_dir(package):
+    return os.path.abspath(os.path.join(scratch_dir, package.name.lower()))
+
+
+def job_telemetry(build):
+    """
+    Run the build and return its telemetry records. When it fails, they're attached
+    to the exception instead, as they'd be lost with the process of the job otherwise.
+    """
+    try:
+        build()
+    except BaseException as e:
+        e.telemetry_records = telemetry.take()
+        raise
+    return telemetry.take()
+
+
+# Packages are passed to the build jobs by name since they aren't picklable,
+# the jobs return the telemetry records of the build
+def build_fedora_job(package_name, sources_staging, fedora_options, *args):
+    package = all_packages[package_name]
+    return job_telemetry(
+        lambda: build_fedora_package(
+            package,
+            *args,
+            work_dir=package_scratch_dir(package),
+            sources_staging=sources_staging,
+            **fedora_options,
+        )
+    )
+
+
+def build_ubuntu_job(package_name, sources_staging, *args):
+    package = all_packages[package_name]
+    return job_telemetry(
+        lambda: build_ubuntu_package(
+            package,
+            *args,
+            work_dir=package_scratch_dir(package),
+            sources_staging=sources_staging,
+        )
+    )
+
+
+def build_binaries_once(packages, sources_staging):
+    """
+    Build the binaries for all the given packages at once, returning the directory with them.
+    """
+    binaries_dir = os.path.abspath(os.path.join(scratch_dir, "binaries"))
+    binary_packages = [p for p in packages if isinstance(p, TezosBinaryPackage)]
+    if binary_packages:
+        with telemetry.stage(None, "build-binaries", binaries_dir):
+            build_binaries(binary_packages, binaries_dir, sources_staging)
+    return binaries_dir
+
+
+def run_build_jobs(build_job, jobs_args, jobs, on_done=None, dependencies=None):
+    """
+    Run the build jobs in a pool of 'jobs' processes, stopping at the first failure.
+    A job is only started once the jobs of the packages it depends on, as given by
+    'dependencies', have succeeded, the others are started as soon as possible.
+    'on_done' is called with the package name of each job once it succeeds.
+    """
+    dependencies = dependencies or {}
+    jobs_args = {job_args[0]: job_args for job_args in jobs_args}
+    # the dependencies restored from the cache or not built at all aren't waited for
+    pending = {
+        package_name: set(dependencies.get(package_name, [])) & set(jobs_args)
+        for package_name in jobs_args
+    }
+
+    def take_ready():
+        ready = [package_name for package_name, deps in pending.items() if not deps]
+        for package_name in ready:
+            del pending[package_name]
+        return ready
+
+    def finish(package_name, records):
+        telemetry.extend(records)
+        if on_done is not None:
+            on_done(package_name)
+        for deps in pending.values():
+            deps.discard(package_name)
+
+    if jobs <= 1:
+        try:
+            while pending:
+                for package_name in take_ready():
+                    finish(package_name, build_job(*jobs_args[package_name]))
+        except BaseException as e:
+            telemetry.extend(getattr(e, "telemetry_records", []))
+            raise
+        return
+    with ProcessPoolExecutor(jobs) as executor:
+        futures = {}
+
+        def submit_ready():
+            for package_name in take_ready():
+                future = executor.submit(build_job, *jobs_args[package_name])
+                futures[future] = package_name
+
+        try:
+            submit_ready()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(futures.pop(future), future.result())
+                submit_ready()
+        except BaseException as e:
+            telemetry.extend(getattr(e, "telemetry_records", []))
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+
+def list_artifacts(artifacts_dir, exts):
+    if not os.path.isdir(artifacts_dir):
+        return []
+    return [
+        f
+        for f in sorted(os.listdir(artifacts_dir))
+        if any(f.endswith(ext) for ext in exts)
+    ]
+
+
+def output_owner():
+    """
+    Owner of the files put in the output dir, set when it's bind-mounted from the host.
+    """
+    owner = os.getenv("OUTPUT_OWNER", None)
+    if not owner:
+        return None
+    uid, gid = owner.split(":")
+    return int(uid), int(gid)
+
+
+def publish_artifacts(artifacts_dir, exts):
+    """
+    Copy the artifacts of a package to the output dir as soon as they are available.
+    """
+    owner = output_owner()
+    for f in list_artifacts(artifacts_dir, exts):
+        dest = os.path.join(output_dir, f)
+        shutil.copy(f"{artifacts_dir}/{f}", dest)
+        if owner is not None:
+            os.chown(dest, *owner)
+
+
+def collect_artifacts(dirs, exts):
+    """
+    List the published artifacts in a deterministic order.
+    """
+    artifact_list_path = os.path.join(output_dir, ".artifact_list")
+    with open(artifact_list_path, "w") as artifact_list:
+        for artifacts_dir in dirs:
+            for f in list_artifacts(artifacts_dir, exts):
+                artifact_list.write(f"{f}\n")
+    owner = output_owner()
+    if owner is not None:
+        os.chown(artifact_list_path, *owner)
+
+
+def write_telemetry():
+    """
+    Write the telemetry records of the build for the host to merge into its report.
+    """
+    telemetry_path = os.path.join(output_dir, ".telemetry.json")
+    telemetry.write(telemetry_path)
+    owner = output_owner()
+    if owner is not None:
+        os.chown(telemetry_path, *owner)
+
+
+def restore_cached_artifacts(args, packages, artifacts_dirs, build_params):
+    """
+    Restore the artifacts of the packages with unchanged inputs from the cache.
+    Return the cache along with the input hashes and the packages left to build.
+    """
+    if args.cache_dir is None:
+        return None, {}, packages
+    from .cache import ArtifactsCache, package_input_hash
+
+    cache = ArtifactsCache(args.cache_dir, args.os)
+    keys = {}
+    packages_to_build = []
+    for package_name, package in packages:
+        keys[package_name] = package_input_hash(
+            package,
+            build_params,
+            args.binaries_dir,
+            getattr(package, "source_archive", None),
+        )
+        if not cache.restore(package, keys[package_name], artifacts_dirs[package_name]):
+            packages_to_build.append((package_name, package))
+    return cache, keys, packages_to_build
+
+
+def store_built_artifacts(cache, keys, packages, artifacts_dirs, exts):
+    if cache is None:
+        return
+    for package_name, package in packages:
+        artifacts_dir = artifacts_dirs[package_name]
+        artifacts = [
+            os.path.join(artifacts_dir, f) for f in list_artifacts(artifacts_dir, exts)
+        ]
+        cache.store(package, keys[package_name], artifacts)
+    cache.report()
+
+
 def build_fedora(args):
 
     target_os = args.os
@@ -130,45 +399,89 @@ def build_fedora(args):
 
     binaries_dir = args.binaries_dir
 
-    build_deps = get_build_deps(binaries_dir)
-
-    home = os.environ["HOME"]
-
     os.makedirs(output_dir, exist_ok=True)
+    shutil.rmtree(scratch_dir, ignore_errors=True)
 
     distributions = list(args.distributions)
 
     packages = []
 
     for package_name in args.packages:
-        packages.append(all_packages[package_name])
+        packages.append((package_name, all_packages[package_name]))
+
+    exts = [".src.rpm"] if is_source else [".rpm"]
+
+    subdir = "SRPMS" if is_source else "RPMS/x86_64"
+
+    artifacts_dirs = {
+        package_name: f"{package_scratch_dir(package)}/rpmbuild/{subdir}"
+        for package_name, package in packages
+    }
+
+    cache, keys, packages_to_build = restore_cached_artifacts(
+        args,
+        packages,
+        artifacts_dirs,
+        [target_os, args.type, distributions, args.mock_archs, args.source_compression],
+    )
+
+    # Source packages are always built from source to stay reproducible
+    packages_binaries_dir = binaries_dir
+    if args.build_once and not is_source and binaries_dir is None:
+        packages_binaries_dir = build_binaries_once(
+            [package for _, package in packages_to_build], args.sources_staging
+        )
+
+    build_deps = get_build_deps(packages_binaries_dir)
 
-    for package in packages:
+    fedora_options = {
+        "mock_archs": args.mock_archs,
+        "mock_jobs": args.mock_jobs,
+        "mock_cache_dir": (
+            os.path.join(args.cache_dir, "mock") if args.cache_dir else None
+        ),
+        "source_compression": args.source_compression,
+    }
+
+    jobs_args = []
+    for package_name, package in packages_to_build:
         run_deps = (
             get_fedora_run_deps(binaries_dir)
             if isinstance(package, TezosBinaryPackage)
             else []
         )
-        build_fedora_package(
-            package,
-            build_deps,
-            run_deps,
-            is_source,
-            distributions,
-            binaries_dir,
+        jobs_args.append(
+            (
+                package_name,
+                args.sources_staging,
+                fedora_options,
+                build_deps,
+                run_deps,
+                is_source,
+                distributions,
+                packages_binaries_dir,
+            )
         )
 
-    exts = [".src.rpm"] if is_source else [".rpm"]
+    # the artifacts restored from the cache are published right away
+    built = [package_name for package_name, _ in packages_to_build]
+    for package_name, _ in packages:
+        if package_name not in built:
+            publish_artifacts(artifacts_dirs[package_name], exts)
+
+    run_build_jobs(
+        build_fedora_job,
+        jobs_args,
+        args.jobs,
+        lambda package_name: publish_artifacts(artifacts_dirs[package_name], exts),
+        PackageGraph(all_packages).dependencies,
+    )
 
-    subdir = "SRPMS" if is_source else "RPMS/x86_64"
-    artifacts_dir = f"{home}/rpmbuild/{subdir}"
+    store_built_artifacts(cache, keys, packages_to_build, artifacts_dirs, exts)
 
-    with open(os.path.join(output_dir, ".artifact_list"), "w") as artifact_list:
-        for f in os.listdir(artifacts_dir):
-            for ext in exts:
-                if f.endswith(ext):
-                    artifact_list.write(f"{f}\n")
-                    shutil.copy(f"{artifacts_dir}/{f}", os.path.join(output_dir, f))
+    collect_artifacts(
+        [artifacts_dirs[package_name] for package_name, _ in packages], exts
+    )
 
 
 def build_ubuntu(args):
@@ -183,11 +496,8 @@ def build_ubuntu(args):
 
     binaries_dir = args.binaries_dir
 
-    build_deps = get_build_deps(binaries_dir, ["cargo-1.78"])
-
-    home = os.environ["HOME"]
-
     os.makedirs(output_dir, exist_ok=True)
+    shutil.rmtree(scratch_dir, ignore_errors=True)
 
     distributions = list(args.distributions)
 
@@ -214,78 +524,105 @@ def build_ubuntu(args):
                         f"ERROR: supplied source dir does not contain source archive for {package.name}"
                     )
         elif dl_sources:
-            for package in packages:
-                if getattr(package, "letter_version", None) is None:
-                    version = package.meta.version
-                    repo = (
-                        "tezos-rc" if "rc" in version or "beta" in version else "tezos"
+            from .launchpad import LaunchpadSources
+
+            with open(
+                os.path.join(
+                    os.path.dirname(__file__), "..", "supported_versions.json"
+                ),
+                "r",
+            ) as f:
+                ubuntu_versions = json.loads(f.read())["ubuntu"]
+            cache_dir = (
+                os.path.join(args.cache_dir, "launchpad")
+                if args.cache_dir
+                else os.path.abspath("launchpad-sources")
+            )
+            to_fetch = [
+                package
+                for package in packages
+                if getattr(package, "letter_version", None) is None
+            ]
+            source_archives = LaunchpadSources(
+                cache_dir, ubuntu_versions, args.launchpad_url
+            ).fetch_all([(p.name.lower(), p.meta.version) for p in to_fetch])
+            for package, source_archive in zip(to_fetch, source_archives):
+                if source_archive is None:
+                    errors.append(
+                        f"ERROR: source archive for {package.name} is not available"
                     )
-                    name = package.name.lower()
-
-                    with open("supported_versions.json", "r") as f:
-                        distributions = json.loads(f.read())["ubuntu"]
-
-                    success = False
-                    for dist in distributions:
-                        source_archive = f"{name}_{package.meta.version}.orig.tar.gz"
-                        url = f"https://launchpad.net/~serokell/+archive/ubuntu/{repo}/+sourcefiles/{name}/2:{version}-0ubuntu1~{dist}/{name}_{version}.orig.tar.gz"
-                        try:
-                            urllib.request.urlretrieve(
-                                url,
-                                source_archive,
-                                lambda count, block_size, total_size: print(
-                                    f"{package.name} source is downloading: "
-                                    + str(
-                                        round(count * block_size / total_size * 100, 2)
-                                    )
-                                    + "%",
-                                    end="\r",
-                                ),
-                            )
-                            print(f"{package.name} source was downloaded successfully")
-                            package.source_archive = os.path.realpath(source_archive)
-                            success = True
-                            break
-                        except (urllib.error.URLError, ValueError):
-                            continue
-                    if not success:
-                        errors.append(
-                            f"ERROR: source archive for {package.name} is not available"
-                        )
+                else:
+                    package.source_archive = source_archive
         if errors:
             print("\n" + "\n".join(errors) + "\n")
             sys.exit(1)
 
-    for package in packages:
+    packages = list(zip(args.packages, packages))
+
+    if not is_source:
+        exts = [".deb"]
+    else:
+        exts = [".orig.tar.gz", ".dsc", ".changes", ".debian.tar.xz", ".buildinfo"]
+
+    artifacts_dirs = {
+        package_name: package_scratch_dir(package) for package_name, package in packages
+    }
+
+    cache, keys, packages_to_build = restore_cached_artifacts(
+        args, packages, artifacts_dirs, [target_os, args.type, distributions]
+    )
+
+    # Source packages are always built from source to stay reproducible
+    packages_binaries_dir = binaries_dir
+    if args.build_once and not is_source and binaries_dir is None:
+        packages_binaries_dir = build_binaries_once(
+            [package for _, package in packages_to_build], args.sources_staging
+        )
+
+    build_deps = get_build_deps(packages_binaries_dir, ["cargo-1.78"])
+
+    jobs_args = []
+    for package_name, package in packages_to_build:
         run_deps = (
             get_ubuntu_run_deps(binaries_dir)
             if isinstance(package, TezosBinaryPackage)
             else []
         )
         common_deps = build_deps + run_deps
-        build_ubuntu_package(
-            package,
-            distributions,
-            common_deps,
-            run_deps,
-            is_source,
-            getattr(package, "source_archive", None),
-            binaries_dir,
+        jobs_args.append(
+            (
+                package_name,
+                args.sources_staging,
+                distributions,
+                common_deps,
+                run_deps,
+                is_source,
+                getattr(package, "source_archive", None),
+                packages_binaries_dir,
+                # only the binaries given with '--binaries-dir' are left unstripped
+                binaries_dir is not None,
+            )
         )
 
-    if not is_source:
-        exts = [".deb"]
-    else:
-        exts = [".orig.tar.gz", ".dsc", ".changes", ".debian.tar.xz", ".buildinfo"]
+    # the artifacts restored from the cache are published right away
+    built = [package_name for package_name, _ in packages_to_build]
+    for package_name, _ in packages:
+        if package_name not in built:
+            publish_artifacts(artifacts_dirs[package_name], exts)
+
+    run_build_jobs(
+        build_ubuntu_job,
+        jobs_args,
+        args.jobs,
+        lambda package_name: publish_artifacts(artifacts_dirs[package_name], exts),
+        PackageGraph(all_packages).dependencies,
+    )
 
-    artifacts_dir = "."
+    store_built_artifacts(cache, keys, packages_to_build, artifacts_dirs, exts)
 
-    with open(os.path.join(output_dir, ".artifact_list"), "w") as artifact_list:
-        for f in os.listdir(artifacts_dir):
-            for ext in exts:
-                if f.endswith(ext):
-                    artifact_list.write(f"{f}\n")
-                    shutil.copy(f"{artifacts_dir}/{f}", os.path.join(output_dir, f))
+    collect_artifacts(
+        [artifacts_dirs[package_name] for package_name, _ in packages], exts
+    )
 
 
 def main():
@@ -294,10 +631,21 @@ def main():
 
     if args.os == "ubuntu":
         args = make_ubuntu_parser(common_parser).parse_args()
-        build_ubuntu(args)
     elif args.os == "fedora":
         args = common_parser.parse_args()
-        build_fedora(args)
+
+    if args.with_dependents:
+        args.packages = PackageGraph(all_packages).with_dependents(args.packages)
+        print(f"Building with the dependents: {' '.join(args.packages)}")
+
+    # the telemetry of a failed build is written too, to see which stage failed
+    try:
+        if args.os == "ubuntu":
+            build_ubuntu(args)
+        elif args.os == "fedora":
+            build_fedora(args)
+    finally:
+        write_telemetry()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,149 @@
+# SPDX-FileCopyrightText: 2024 Oxhead Alpha
+# SPDX-License-Identifier: LicenseRef-MIT-OA
+
+# Renders the packaging files of all the packages for all the supported distributions
+# in one process, without fetching or building anything, and compares them with the
+# golden files, so that the effect of a change to the packaging is seen right away.
+#
+# Example:
+# cd docker && python3 -m package.render_all
+# cd docker && python3 -m package.render_all --update
+
+import os, sys, json, time, shutil, argparse
+from copy import copy
+
+from .meta import PackagesMeta, packages_meta
+from .model import FileTree, TezosBinaryPackage, render_packages_systemd_units
+from .packages import packages
+from .ubuntu import render_common_debian_files, render_distribution_debian_files
+from .package_generator import (
+    get_build_deps,
+    get_ubuntu_run_deps,
+    get_fedora_run_deps,
+)
+
+golden_dir = os.path.join(
+    os.path.dirname(__file__), "..", "..", "tests", "packaging", "golden"
+)
+
+# The version and the date change with every release, so the files are rendered
+# with placeholders for them to only change along with the packaging
+placeholder_meta = PackagesMeta(
+    tag="v0.0",
+    version="0.0",
+    release="1",
+    ubuntu_epoch=packages_meta.ubuntu_epoch,
+    fedora_epoch=packages_meta.fedora_epoch,
+    maintainer=packages_meta.maintainer,
+    license_version="v0.0",
+)
+placeholder_date = "Thu, 01 Jan 1970 00:00:00 +0000"
+
+# The packages are either built from source or from prebuilt static binaries
+variants = {"source": None, "binaries": "binaries"}
+
+
+def render_ubuntu(pkg, units, ubuntu_version, binaries_dir):
+    # the dependencies are the same as the ones the package generator uses
+    build_deps = get_build_deps(binaries_dir, ["cargo-1.78"])
+    run_deps = (
+        get_ubuntu_run_deps(binaries_dir) if isinstance(pkg, TezosBinaryPackage) else []
+    )
+    tree = FileTree()
+    tree.add(pkg.buildfile, pkg.render_buildfile(ubuntu_version, binaries_dir))
+    tree.update(render_common_debian_files(pkg, units), "debian")
+    tree.update(
+        render_distribution_debian_files(
+            pkg,
+            ubuntu_version,
+            build_deps + run_deps,
+            run_deps,
+            placeholder_date,
+            binaries_dir is not None,
+        ),
+        "debian",
+    )
+    return tree
+
+
+def render_fedora(pkg, units, binaries_dir):
+    build_deps = get_build_deps(binaries_dir)
+    run_deps = (
+        get_fedora_run_deps(binaries_dir) if isinstance(pkg, TezosBinaryPackage) else []
+    )
+    tree = FileTree()
+    tree.update(units)
+    tree.add(pkg.buildfile, pkg.render_buildfile(None, binaries_dir))
+    tree.add(f"{pkg.name}.spec", pkg.render_spec_file(build_deps + run_deps, run_deps))
+    return tree
+
+
+def render_all():
+    """
+    Render the files of every package for every supported distribution into a tree
+    laid out as '<variant>/<os>[/<distribution>]/<package>/'.
+    """
+    with open(
+        os.path.join(os.path.dirname(__file__), "..", "supported_versions.json"), "r"
+    ) as f:
+        supported_versions = json.load(f)
+
+    # the units of all the packages are rendered and validated in a single batch
+    units = render_packages_systemd_units(packages.values())
+
+    tree = FileTree()
+    for variant, binaries_dir in variants.items():
+        for package in packages.values():
+            pkg = copy(package)
+            pkg.meta = placeholder_meta
+            pkg_units = units.subtree(pkg.name)
+            for ubuntu_version in supported_versions["ubuntu"]:
+                tree.update(
+                    render_ubuntu(pkg, pkg_units, ubuntu_version, binaries_dir),
+                    f"{variant}/ubuntu/{ubuntu_version}/{pkg.name}",
+                )
+            tree.update(
+                render_fedora(pkg, pkg_units, binaries_dir),
+                f"{variant}/fedora/{pkg.name}",
+            )
+    return tree
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--golden-dir",
+        help="directory with the expected files",
+        default=golden_dir,
+        type=os.path.abspath,
+    )
+    parser.add_argument(
+        "--update",
+        help="replace the golden files with the rendered ones",
+        action="store_true",
+    )
+    args = parser.parse_args()
+
+    start = time.monotonic()
+    tree = render_all()
+    print(f"Rendered {len(tree.files)} files in {time.monotonic() - start:.2f}s")
+
+    if args.update:
+        shutil.rmtree(args.golden_dir, ignore_errors=True)
+        tree.write(args.golden_dir)
+        print(f"Golden files updated in {args.golden_dir}")
+        return
+
+    diff = tree.diff(args.golden_dir)
+    if diff:
+        sys.stdout.write(diff)
+        print(
+            "The rendered files differ from the golden ones, run with '--update' "
+            "if the changes are expected."
+        )
+        sys.exit(1)
+    print("The rendered files match the golden ones.")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,20 @@
 # SPDX-License-Identifier: LicenseRef-MIT-OA
 set -euo pipefail
 
+# Usage: build-binary.sh <dune-filepath> <binary-name> [<dune-filepath> <binary-name>...]
+# All the given binaries are built within a single dune invocation.
+
 export OPAMYES=true
 mkdir opamroot
 export OPAMROOT=$PWD/opamroot
 
-dune_filepath="$1"
-binary_name="$2"
+dune_filepaths=()
+binary_names=()
+while [[ $# -gt 0 ]]; do
+    dune_filepaths+=("$1")
+    binary_names+=("$2")
+    shift 2
+done
 
 opam init local ./opam-repository --bare --disable-sandboxing
 
@@ -31,6 +39,8 @@ OPAMASSUMEDEPEXTS=true opam install conf-rust
 export CFLAGS="-fPIC ${CFLAGS:-}"
 OPAMASSUMEDEPEXTS=true opam install opam/virtual/octez-deps.opam.locked --deps-only --criteria="-notuptodate,-changed,-removed"
 
-dune build "$dune_filepath"
-cp "./_build/default/$dune_filepath" "../$binary_name"
+dune build "${dune_filepaths[@]}"
+for i in "${!dune_filepaths[@]}"; do
+    cp "./_build/default/${dune_filepaths[$i]}" "../${binary_names[$i]}"
+done
 cd ..
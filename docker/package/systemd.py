@@ -1,7 +1,8 @@
 # SPDX-FileCopyrightText: 2022 Oxhead Alpha
 # SPDX-License-Identifier: LicenseRef-MIT-OA
+import re
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List
 
 # There are more possible fields, but only these are used by tezos services
 @dataclass
@@ -57,60 +58,145 @@ class SystemdUnit:
     instances: List[str] = None
 
 
-def print_service_file(service_file: ServiceFile, out):
-    after = requires = part_of = environment = environment_files = wanted_by = ""
-    exec_start_pres = exec_start_posts = exec_stop_posts = ""
-    if service_file.unit.after is not None:
-        after = "".join(f"After={x}\n" for x in service_file.unit.after)
-    if service_file.unit.requires is not None:
-        requires = "".join(f"Requires={x}\n" for x in service_file.unit.requires)
-    if service_file.unit.part_of is not None:
-        part_of = "".join(f"PartOf={x}\n" for x in service_file.unit.part_of)
-    if service_file.service.environment is not None:
-        environment = "".join(
-            f'Environment="{x}"\n' for x in service_file.service.environment
-        )
-    if service_file.service.environment_files is not None:
-        environment_files = "\n".join(
-            f"EnvironmentFile={x}" for x in service_file.service.environment_files
-        )
-    if service_file.install.wanted_by is not None:
-        wanted_by = "".join(f"WantedBy={x}\n" for x in service_file.install.wanted_by)
-    if service_file.service.exec_start_pre is not None:
-        exec_start_pres = "\n".join(
-            f"ExecStartPre={x}" for x in service_file.service.exec_start_pre
-        )
-    if service_file.service.exec_start_post is not None:
-        exec_start_posts = "\n".join(
-            f"ExecStartPost={x}" for x in service_file.service.exec_start_post
-        )
-    if service_file.service.exec_stop_post is not None:
-        exec_stop_posts = "\n".join(
-            f"ExecStopPost={x}" for x in service_file.service.exec_stop_post
-        )
-    file_contents = f"""# SPDX-FileCopyrightText: 2022 Oxhead Alpha
-#
-# SPDX-License-Identifier: LicenseRef-MIT-OA
-[Unit]
-{after}{requires}{part_of}Description={service_file.unit.description}
-[Service]
-{environment_files}
-{environment}
-{exec_start_pres}
-{f"TimeoutStartSec={service_file.service.timeout_start_sec}" if service_file.service.timeout_start_sec is not None else ""}
-ExecStart={service_file.service.exec_start}
-{exec_start_posts}
-{exec_stop_posts}
-StateDirectory={service_file.service.state_directory}
-User={service_file.service.user}
-Group={service_file.service.user}
-{"RemainAfterExit=yes" if service_file.service.remain_after_exit else ""}
-{f"Type={service_file.service.type_}" if service_file.service.type_ is not None else ""}
-{f"NotifyAccess={service_file.service.notify_access}" if service_file.service.notify_access is not None else ""}
-{f"Restart={service_file.service.restart}" if service_file.service.restart is not None else ""}
-{f"KeyringMode={service_file.service.keyring_mode}" if service_file.service.keyring_mode is not None else ""}
-[Install]
-{wanted_by}
-"""
-    with open(out, "w") as f:
-        f.write(file_contents)
+class InvalidUnitError(Exception):
+    pass
+
+
+unit_types = ["service", "socket", "target", "timer", "path", "mount", "slice"]
+# '%i' and the like are specifiers expanded by systemd
+unit_name_re = re.compile(
+    rf"[A-Za-z0-9:_.\\%-]+(@[A-Za-z0-9:_.\\%@-]*)?\.({'|'.join(unit_types)})"
+)
+# the command may be prefixed with the special executable prefixes
+exec_re = re.compile(r"[@\-:+!|]*/\S*( .*)?")
+time_span_re = re.compile(
+    r"infinity|(\d+(\.\d+)?\s*(us|ms|s|sec|m|min|h|hr|d|w|M|y)?\s*)+"
+)
+
+value_grammar = {
+    "After": unit_name_re,
+    "Requires": unit_name_re,
+    "PartOf": unit_name_re,
+    "WantedBy": unit_name_re,
+    "Environment": re.compile(r'[A-Za-z_][A-Za-z0-9_]*=[^"\\]*'),
+    "EnvironmentFile": re.compile(r"-?/\S+"),
+    "ExecStartPre": exec_re,
+    "ExecStart": exec_re,
+    "ExecStartPost": exec_re,
+    "ExecStopPost": exec_re,
+    "TimeoutStartSec": time_span_re,
+    "StateDirectory": re.compile(r"[^/\s][^\s]*"),
+    "User": re.compile(r"[A-Za-z_%][A-Za-z0-9_%-]*"),
+    "Group": re.compile(r"[A-Za-z_%][A-Za-z0-9_%-]*"),
+    "RemainAfterExit": re.compile(r"yes|no"),
+    "Type": re.compile(r"simple|exec|forking|oneshot|dbus|notify|notify-reload|idle"),
+    "NotifyAccess": re.compile(r"none|main|exec|all"),
+    "Restart": re.compile(
+        r"no|always|on-success|on-failure|on-abnormal|on-abort|on-watchdog"
+    ),
+    "KeyringMode": re.compile(r"inherit|private|shared"),
+}
+
+
+def unit_sections(service_file: ServiceFile):
+    """
+    Return the (key, value) entries of each section of the unit, in the order
+    they're rendered in.
+    """
+    unit, service, install = (
+        service_file.unit,
+        service_file.service,
+        service_file.install,
+    )
+
+    def entries(key, values):
+        return [(key, x) for x in values or []]
+
+    def entry(key, value):
+        return [] if value is None else [(key, value)]
+
+    return {
+        "Unit": entries("After", unit.after)
+        + entries("Requires", unit.requires)
+        + entries("PartOf", unit.part_of)
+        + entry("Description", unit.description),
+        "Service": entries("EnvironmentFile", service.environment_files)
+        + entries("Environment", service.environment)
+        + entries("ExecStartPre", service.exec_start_pre)
+        + entry("TimeoutStartSec", service.timeout_start_sec)
+        + entry("ExecStart", service.exec_start)
+        + entries("ExecStartPost", service.exec_start_post)
+        + entries("ExecStopPost", service.exec_stop_post)
+        + entry("StateDirectory", service.state_directory)
+        + entry("User", service.user)
+        + entry("Group", service.user)
+        + entry("RemainAfterExit", "yes" if service.remain_after_exit else None)
+        + entry("Type", service.type_)
+        + entry("NotifyAccess", service.notify_access)
+        + entry("Restart", service.restart)
+        + entry("KeyringMode", service.keyring_mode),
+        "Install": entries("WantedBy", install.wanted_by),
+    }
+
+
+def validate_unit(sections):
+    """
+    Return the errors of the entries of the unit sections that don't match the
+    grammar of their values.
+    """
+    errors = []
+    for section, entries in sections.items():
+        for key, value in entries:
+            if not isinstance(value, str) or not value.strip():
+                errors.append(f"[{section}] {key} has an empty value")
+            elif "\n" in value:
+                errors.append(f"[{section}] {key} value spans several lines: {value!r}")
+            elif key in value_grammar and not value_grammar[key].fullmatch(value):
+                errors.append(f"[{section}] {key} has an invalid value: {value!r}")
+    return errors
+
+
+def format_unit(sections):
+    lines = [
+        "# SPDX-FileCopyrightText: 2022 Oxhead Alpha",
+        "#",
+        "# SPDX-License-Identifier: LicenseRef-MIT-OA",
+    ]
+    for section, entries in sections.items():
+        if len(lines) > 3:
+            lines.append("")
+        lines.append(f"[{section}]")
+        for key, value in entries:
+            # the value is quoted to keep the spaces in it
+            if key == "Environment":
+                value = f'"{value}"'
+            lines.append(f"{key}={value}")
+    return "\n".join(lines) + "\n"
+
+
+# The rendered units keyed by the representation of their definition, since many
+# of them are rendered several times for the different distributions and packages
+rendered_units = {}
+
+
+def render_service_files(service_files: Dict[str, ServiceFile]):
+    """
+    Render the units keyed by their names at once, failing with the errors of all
+    the invalid ones.
+    """
+    rendered = {}
+    errors = []
+    for name, service_file in service_files.items():
+        key = repr(service_file)
+        if key not in rendered_units:
+            sections = unit_sections(service_file)
+            unit_errors = validate_unit(sections)
+            if unit_errors:
+                errors += [f"{name}: {error}" for error in unit_errors]
+                continue
+            rendered_units[key] = format_unit(sections)
+        rendered[name] = rendered_units[key]
+    if errors:
+        raise InvalidUnitError("Invalid systemd units:\n" + "\n".join(errors))
+    return rendered
+
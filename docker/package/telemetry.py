@@ -0,0 +1,109 @@
+# SPDX-FileCopyrightText: 2024 Oxhead Alpha
+# SPDX-License-Identifier: LicenseRef-MIT-OA
+import os, json, time, threading
+
+from contextlib import contextmanager
+
+
+def path_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    size = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            file_path = os.path.join(root, f)
+            if not os.path.islink(file_path):
+                size += os.path.getsize(file_path)
+    return size
+
+
+class Telemetry:
+    """
+    Collects the time spent in each stage of the packaging of each package,
+    along with the size of what the stage produced when it's known.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.lock = threading.Lock()
+
+    def add(self, package, stage, seconds, size=None, **fields):
+        with self.lock:
+            self.records.append(
+                {
+                    "package": package,
+                    "stage": stage,
+                    "seconds": round(seconds, 3),
+                    "bytes": size,
+                    **fields,
+                }
+            )
+
+    @contextmanager
+    def stage(self, package, stage, output=None, **fields):
+        """
+        Time the stage, measuring the size of the 'output' path once it's done.
+        The stages that raise are recorded too, marked as failed.
+        """
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException:
+            fields["failed"] = True
+            raise
+        finally:
+            seconds = time.monotonic() - start
+            if output is not None and os.path.exists(output):
+                self.add(package, stage, seconds, path_size(output), **fields)
+            else:
+                self.add(package, stage, seconds, **fields)
+
+    # The build jobs run in other processes, so they hand their records over
+    def take(self):
+        with self.lock:
+            records, self.records = self.records, []
+        return records
+
+    def extend(self, records, **fields):
+        with self.lock:
+            self.records += [dict(record, **fields) for record in records]
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump({"stages": self.records}, f, indent=2)
+
+    def load(self, path, **fields):
+        """
+        Merge the records written to 'path' by another process, e.g. a build container.
+        """
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.extend(json.load(f)["stages"], **fields)
+            os.remove(path)
+
+    def summary(self):
+        """
+        Return the total time and size of each kind of stage, slowest first,
+        the stages for the distributions or chroots after ':' being grouped together.
+        """
+        totals = {}
+        for record in self.records:
+            stage = record["stage"].split(":")[0]
+            seconds, size, count = totals.get(stage, (0, 0, 0))
+            totals[stage] = (
+                seconds + record["seconds"],
+                size + (record["bytes"] or 0),
+                count + 1,
+            )
+        lines = [f"{'stage':<40}{'runs':>6}{'seconds':>10}{'MiB':>10}"]
+        for stage, (seconds, size, count) in sorted(
+            totals.items(), key=lambda x: -x[1][0]
+        ):
+            lines.append(f"{stage:<40}{count:>6}{seconds:>10.1f}{size / 2**20:>10.1f}")
+        for record in self.records:
+            if record.get("failed"):
+                lines.append(f"failed: {record['stage']} of {record['package']}")
+        return "\n".join(lines)
+
+
+telemetry = Telemetry()
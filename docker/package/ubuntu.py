@@ -4,8 +4,41 @@ import os, shutil, subprocess
 
 from typing import List
 
-from .model import AbstractPackage
-from .systemd import print_service_file
+from .model import AbstractPackage, FileTree, stage_tree
+from .compression import create_tarball, extract_tarball
+from .telemetry import telemetry
+
+
+def render_common_debian_files(pkg: AbstractPackage, units: FileTree = None):
+    """
+    Render the files of the 'debian' directory that are the same for all distributions.
+    The systemd units of the package are rendered unless they're given in 'units'.
+    """
+    tree = FileTree()
+    tree.update(pkg.render_systemd_units() if units is None else units)
+    tree.add("compat", "10")
+    tree.add("install", pkg.render_install())
+    tree.add("links", pkg.render_links())
+    tree.add("postinst", pkg.render_postinst())
+    tree.add("postrm", pkg.render_postrm())
+    return tree
+
+
+def render_distribution_debian_files(
+    pkg: AbstractPackage,
+    ubuntu_version: str,
+    build_deps: List[str],
+    run_deps: List[str],
+    date: str,
+    static_binaries: bool = False,
+):
+    tree = FileTree()
+    tree.add("rules", pkg.render_rules(ubuntu_version, static_binaries))
+    tree.add("control", pkg.render_control_file(build_deps, run_deps, ubuntu_version))
+    tree.add(
+        "changelog", pkg.render_changelog(ubuntu_version, pkg.meta.maintainer, date)
+    )
+    return tree
 
 
 def build_ubuntu_package(
@@ -16,108 +49,122 @@ def build_ubuntu_package(
     is_source: bool,
     source_archive_path: str = None,
     binaries_dir: str = None,
+    static_binaries: bool = False,
+    work_dir: str = ".",
+    sources_staging: str = "copy",
 ):
-    for ubuntu_version in ubuntu_versions:
-        # ubuntu prohibits uppercase in packages names
-        pkg_name = pkg.name.lower()
-        old_version = pkg.meta.version
-        # debian build utils don't like '_' symbol in version
-        fixed_version = pkg.meta.version.replace("_", "-")
-        dir = f"{pkg_name}-{fixed_version}"
-        cwd = os.path.dirname(__file__)
-        date = subprocess.check_output(["date", "-R"]).decode().strip()
-        if source_archive_path is None:
-            pkg.fetch_sources(dir, binaries_dir)
+    # All the files are created within 'work_dir', including the resulting
+    # artifacts, so that several packages can be built concurrently
+    os.makedirs(work_dir, exist_ok=True)
+    # ubuntu prohibits uppercase in packages names
+    pkg_name = pkg.name.lower()
+    old_version = pkg.meta.version
+    # debian build utils don't like '_' symbol in version
+    fixed_version = pkg.meta.version.replace("_", "-")
+    dir = f"{pkg_name}-{fixed_version}"
+    pkg_dir = os.path.join(work_dir, dir)
+    debian_dir = os.path.join(pkg_dir, "debian")
+    cwd = os.path.dirname(__file__)
+    date = subprocess.check_output(["date", "-R"]).decode().strip()
+
+    # The sources are fetched and archived once, along with the 'debian' files
+    # that are the same for all distributions. This tree is then staged as a working
+    # copy for each distribution, in which only the distribution-specific files
+    # are generated.
+    if source_archive_path is None:
+        with telemetry.stage(pkg.name, "fetch-sources", pkg_dir):
+            pkg.fetch_sources(pkg_dir, binaries_dir, sources_staging)
             pkg.gen_buildfile(
-                "/".join([dir, pkg.buildfile]), ubuntu_version, binaries_dir
+                os.path.join(pkg_dir, pkg.buildfile), ubuntu_versions[0], binaries_dir
             )
-            subprocess.run(["tar", "-czf", f"{dir}.tar.gz", dir], check=True)
-        else:
-            shutil.copy(source_archive_path, f"{dir}.tar.gz")
-            subprocess.run(["tar", "-xzf", f"{dir}.tar.gz"], check=True)
-        pkg.meta.version = fixed_version
+        with telemetry.stage(pkg.name, "source-tarball", f"{pkg_dir}.tar.gz"):
+            create_tarball(f"{dir}.tar.gz", [dir], work_dir)
+    else:
+        shutil.copy(source_archive_path, f"{pkg_dir}.tar.gz")
+        with telemetry.stage(pkg.name, "extract-sources", pkg_dir):
+            extract_tarball(f"{dir}.tar.gz", work_dir)
+    pkg.meta.version = fixed_version
 
-        os.chdir(dir)
-        subprocess.run(["rm", "-r", "debian"])
-        subprocess.run(["dh_make", "-syf" f"../{dir}.tar.gz"], check=True)
-        for systemd_unit in pkg.systemd_units:
-            if systemd_unit.service_file.service.environment_files is not None:
-                systemd_unit.service_file.service.environment_files = [
-                    x.lower()
-                    for x in systemd_unit.service_file.service.environment_files
-                ]
-            if systemd_unit.suffix is None:
-                unit_name = pkg_name
-            else:
-                unit_name = f"{pkg_name}-{systemd_unit.suffix}"
-            out_path = (
-                f"debian/{unit_name}@.service"
-                if systemd_unit.instances is not None
-                else f"debian/{unit_name}.service"
+    subprocess.run(["rm", "-r", "debian"], cwd=pkg_dir)
+    with telemetry.stage(pkg.name, "dh_make"):
+        subprocess.run(["dh_make", "-syf" f"../{dir}.tar.gz"], cwd=pkg_dir, check=True)
+    for systemd_unit in pkg.systemd_units:
+        if systemd_unit.suffix is None:
+            unit_name = pkg_name
+        else:
+            unit_name = f"{pkg_name}-{systemd_unit.suffix}"
+        if systemd_unit.config_file is not None:
+            default_name = (
+                unit_name if systemd_unit.instances is None else f"{unit_name}@"
             )
-            print_service_file(systemd_unit.service_file, out_path)
-            if systemd_unit.config_file is not None:
-                default_name = (
-                    unit_name if systemd_unit.instances is None else f"{unit_name}@"
-                )
-                default_path = f"debian/{default_name}.default"
-                shutil.copy(f"{cwd}/defaults/{systemd_unit.config_file}", default_path)
-                if systemd_unit.config_file_append is not None:
-                    with open(default_path, "a") as def_file:
-                        def_file.write("\n".join(systemd_unit.config_file_append))
-
-            for script, script_source in [
-                (systemd_unit.startup_script, systemd_unit.startup_script_source),
-                (systemd_unit.prestart_script, systemd_unit.prestart_script_source),
-                (systemd_unit.poststop_script, systemd_unit.poststop_script_source),
-            ]:
-                if script is not None:
-                    dest_path = f"debian/{script}"
-                    source_script_name = (
-                        script if script_source is None else script_source
-                    )
-                    source_path = f"{cwd}/scripts/{source_script_name}"
-                    shutil.copy(source_path, dest_path)
-
-            for script in pkg.additional_scripts:
-                dest_path = f"debian/{script.name}"
-                source_path = f"{cwd}/scripts/{script.local_file_name}"
-                with open(source_path, "r") as src:
-                    with open(dest_path, "w") as dst:
-                        dst.write(script.transform(src.read()))
-
-        # Patches only make sense when we're reusing the old sources that are not static binary
-        if (
-            len(pkg.patches) > 0
-            and source_archive_path is not None
-            and binaries_dir is None
-        ):
-            os.makedirs("debian/patches")
-            with open("debian/patches/series", "w") as f:
-                for patch in pkg.patches:
-                    shutil.copy(f"{cwd}/patches/{patch}", f"debian/patches/{patch}")
-                    f.write(patch)
-        with open("debian/compat", "w") as f:
-            f.write("10")
-        pkg.gen_install("debian/install")
-        pkg.gen_links("debian/links")
-        pkg.gen_rules("debian/rules", ubuntu_version, binaries_dir)
-        pkg.gen_postinst("debian/postinst")
-        pkg.gen_postrm("debian/postrm")
-        pkg.gen_control_file(build_deps, run_deps, ubuntu_version, "debian/control")
-        # License is downloaded from the tezos repo, thus version should be without workarounds
-        pkg.meta.version = old_version
-        pkg.gen_license("debian/copyright")
+            default_path = f"{debian_dir}/{default_name}.default"
+            shutil.copy(f"{cwd}/defaults/{systemd_unit.config_file}", default_path)
+            if systemd_unit.config_file_append is not None:
+                with open(default_path, "a") as def_file:
+                    def_file.write("\n".join(systemd_unit.config_file_append))
+
+        for script, script_source in [
+            (systemd_unit.startup_script, systemd_unit.startup_script_source),
+            (systemd_unit.prestart_script, systemd_unit.prestart_script_source),
+            (systemd_unit.poststop_script, systemd_unit.poststop_script_source),
+        ]:
+            if script is not None:
+                dest_path = f"{debian_dir}/{script}"
+                source_script_name = script if script_source is None else script_source
+                source_path = f"{cwd}/scripts/{source_script_name}"
+                shutil.copy(source_path, dest_path)
+
+        for script in pkg.additional_scripts:
+            dest_path = f"{debian_dir}/{script.name}"
+            source_path = f"{cwd}/scripts/{script.local_file_name}"
+            with open(source_path, "r") as src:
+                with open(dest_path, "w") as dst:
+                    dst.write(script.transform(src.read()))
+
+    # Patches only make sense when we're reusing the old sources that are not static binary
+    if (
+        len(pkg.patches) > 0
+        and source_archive_path is not None
+        and binaries_dir is None
+    ):
+        os.makedirs(f"{debian_dir}/patches")
+        with open(f"{debian_dir}/patches/series", "w") as f:
+            for patch in pkg.patches:
+                shutil.copy(f"{cwd}/patches/{patch}", f"{debian_dir}/patches/{patch}")
+                f.write(patch)
+    render_common_debian_files(pkg).write(debian_dir)
+    # License is downloaded from the tezos repo, thus version should be without workarounds
+    pkg.meta.version = old_version
+    pkg.gen_license(f"{debian_dir}/copyright")
+    pkg.meta.version = fixed_version
+    subprocess.run(
+        "rm -f debian/*.ex debian/*.EX debian/README*",
+        shell=True,
+        cwd=pkg_dir,
+        check=True,
+    )
+    pkg.meta.version = old_version
+
+    base_dir = f"{pkg_dir}.base"
+    os.rename(pkg_dir, base_dir)
+
+    for ubuntu_version in ubuntu_versions:
+        # the build modifies the files of the working copy in place, so these
+        # can't be shared with the base tree through hard links
+        with telemetry.stage(pkg.name, f"stage-tree:{ubuntu_version}", pkg_dir):
+            stage_tree(base_dir, pkg_dir, ["reflink", "copy"])
         pkg.meta.version = fixed_version
-        subprocess.run(
-            "rm -f debian/*.ex debian/*.EX debian/README*", shell=True, check=True
-        )
-        pkg.gen_changelog(ubuntu_version, pkg.meta.maintainer, date, "debian/changelog")
-        subprocess.run(
-            ["dpkg-buildpackage", "-S" if is_source else "-b", "-us", "-uc"],
-            check=True,
-        )
-        os.chdir("..")
+        render_distribution_debian_files(
+            pkg, ubuntu_version, build_deps, run_deps, date, static_binaries
+        ).write(debian_dir)
+        with telemetry.stage(pkg.name, f"dpkg-buildpackage:{ubuntu_version}"):
+            subprocess.run(
+                ["dpkg-buildpackage", "-S" if is_source else "-b", "-us", "-uc"],
+                cwd=pkg_dir,
+                check=True,
+            )
         pkg.meta.version = old_version
 
-        subprocess.run(f"rm -rf {dir}", shell=True, check=True)
+        shutil.rmtree(pkg_dir)
+
+    shutil.rmtree(base_dir)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2024 Oxhead Alpha
+# SPDX-License-Identifier: LicenseRef-MIT-OA
+
+# This script compares the compression backends used for the package source
+# tarballs on a source tree, e.g. the Octez sources fetched for the packages.
+# For each backend it reports the time to create and to extract the tarball
+# along with its size, relative to the single-threaded 'gzip' used by 'tar -z'.
+#
+# Example:
+# ./docker/tests/benchmark-compression.py docker/sources/tezos
+
+import argparse, os, shutil, sys, tempfile, time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from package.compression import Codec, codecs, create_tarball, extract_tarball
+
+parser = argparse.ArgumentParser()
+parser.add_argument("tree", help="source tree to compress", type=os.path.abspath)
+args = parser.parse_args()
+
+backends = {
+    "gzip (single-threaded)": Codec("gzip", "tar.gz", [["gzip", "-n"]]),
+    **codecs,
+}
+
+
+def timed(f, *args):
+    start = time.monotonic()
+    f(*args)
+    return time.monotonic() - start
+
+
+results = {}
+with tempfile.TemporaryDirectory() as tmp:
+    for name, codec in backends.items():
+        try:
+            program = codec.program()
+        except Exception as e:
+            print(f"{name}: skipped, {e}")
+            continue
+        archive = os.path.join(tmp, f"tree.{codec.ext}")
+        extract_dir = os.path.join(tmp, "extracted")
+        os.makedirs(extract_dir)
+        create_time = timed(
+            create_tarball,
+            archive,
+            [os.path.basename(args.tree)],
+            os.path.dirname(args.tree),
+            codec,
+        )
+        extract_time = timed(extract_tarball, archive, extract_dir, codec)
+        results[name] = (program, create_time, extract_time, os.path.getsize(archive))
+        os.remove(archive)
+        shutil.rmtree(extract_dir)
+
+baseline = results.get("gzip (single-threaded)")
+print(f"{'backend':<24}{'program':<16}{'create':>10}{'extract':>10}{'size MiB':>10}")
+for name, (program, create_time, extract_time, size) in results.items():
+    speedup = f" (x{baseline[1] / create_time:.1f})" if baseline else ""
+    print(
+        f"{name:<24}{program:<16}{create_time:>9.1f}s{extract_time:>9.1f}s"
+        f"{size / 2**20:>10.1f}{speedup}"
+    )
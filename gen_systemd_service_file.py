@@ -8,16 +8,20 @@
 # needs to be updated too.
 
 from docker.package.packages import packages
-from docker.package.systemd import print_service_file
+from docker.package.systemd import render_service_files
 import sys
 
 if len(sys.argv) > 1:
     binary_name = sys.argv[1]
     for package in packages.values():
         if binary_name == package.name:
+            service_files = {}
             for systemd_unit in package.systemd_units:
                 if systemd_unit.suffix is None:
                     out_name = f"{package.name}.service"
                 else:
                     out_name = f"{package.name}-{systemd_unit.suffix}.service"
-                print_service_file(systemd_unit.service_file, out_name)
+                service_files[out_name] = systemd_unit.service_file
+            for out_name, contents in render_service_files(service_files).items():
+                with open(out_name, "w") as f:
+                    f.write(contents)
@@ -5,13 +5,30 @@
 import os
 import re
 import sys
-import subprocess
+import json
+import argparse
 
-sys.path.append("docker")
-from supported_versions import fedora_versions
+sys.path.append("docker/build")
+from util.upload import UploadScheduler, dput_command
 
-args = iter(sys.argv[1:])
-source_packages_path = next(args)
+parser = argparse.ArgumentParser()
+parser.add_argument("directory", help="directory with the signed source packages")
+parser.add_argument("chroot", help="copr chroot to build the packages in", nargs="?")
+parser.add_argument("--jobs", "-j", type=int, default=4)
+parser.add_argument("--retries", type=int, default=3)
+parser.add_argument("--ledger", type=os.path.abspath)
+parser.add_argument("--dry-run", action="store_true")
+args = parser.parse_args()
+
+source_packages_path = args.directory
+
+with open("./docker/supported_versions.json") as f:
+    fedora_versions = json.loads(f.read()).get("fedora")
+
+copr_cli_command = os.getenv(
+    "COPR_CLI_COMMAND",
+    "/run/wrappers/bin/sudo -u copr-uploader /run/current-system/sw/bin/copr-cli",
+)
 
 with open("dput.cfg", "w") as dput_cfg:
     dput_cfg.write(
@@ -55,25 +72,37 @@ else:
     launchpad_ppa = "tezos-serokell"
     copr_project = "@Serokell/Tezos"
 
+uploads = []
+
 for f in filter(lambda x: x.endswith(".changes"), os.listdir(source_packages_path)):
-    subprocess.call(
-        f"execute-dput -c dput.cfg {launchpad_ppa} {os.path.join(source_packages_path, f)}",
-        shell=True,
+    path = os.path.join(source_packages_path, f)
+    uploads.append(
+        (launchpad_ppa, path, f"{dput_command} -c dput.cfg {launchpad_ppa} {path}")
     )
 
 archs = ["x86_64", "aarch64"]
-chroot = next(args, None)
-if chroot is None:
+if args.chroot is None:
     chroots = [
         f"fedora-{version}-{arch}" for version in fedora_versions for arch in archs
     ]
 else:
-    chroots = [chroot]
+    chroots = [args.chroot]
 
 chroots = " ".join(f"-r {chroot}" for chroot in chroots)
 
 for f in filter(lambda x: x.endswith(".src.rpm"), os.listdir(source_packages_path)):
-    subprocess.call(
-        f"/run/wrappers/bin/sudo -u copr-uploader /run/current-system/sw/bin/copr-cli build {chroots} --nowait {copr_project} {os.path.join(source_packages_path, f)}",
-        shell=True,
+    path = os.path.join(source_packages_path, f)
+    uploads.append(
+        (
+            f"{copr_project} {chroots}",
+            path,
+            f"{copr_cli_command} build {chroots} --nowait {copr_project} {path}",
+        )
     )
+
+UploadScheduler(
+    args.ledger or os.path.join(source_packages_path, "upload-ledger.json"),
+    args.jobs,
+    args.retries,
+    dry_run=args.dry_run,
+).run(uploads)
@@ -0,0 +1,121 @@
+#! /usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2024 Oxhead Alpha
+# SPDX-License-Identifier: LicenseRef-MIT-OA
+
+# This script checks how 'tezos-vote --batch' plans the votes of several bakers.
+# The node RPC is stubbed with the responses of the
+# 'context/delegates/<pkh>/voting_info' endpoint and the baker keys are faked,
+# so neither a node nor octez-client is needed.
+#
+# Example:
+# ./tests/baking/batch-voting.py
+
+import os, sys, unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "baking", "src"))
+# the wizard parses the command line when it's imported
+argv, sys.argv = sys.argv, [sys.argv[0], "--batch", "baker"]
+
+import tezos_baking.tezos_voting_wizard as wizard
+from tezos_baking.rpc import RpcClient, RpcError
+
+sys.argv = argv
+
+proposal_a = "PtParisBxoLz5gzMmn3d9WBQNoPSZakgnkMC2VNuQ3KXfUtUQeZ"
+proposal_b = "PsQuebecnLByd3JwTiGadoG4nGWi3HYiLXUjkibeFV8dCFeVMUg"
+
+keys = {
+    "baker1": ("unencrypted:edsk1", "tz1baker1"),
+    "baker2": ("unencrypted:edsk2", "tz1baker2"),
+    "baker3": ("unencrypted:edsk3", "tz1baker3"),
+}
+
+
+class StubRpcClient(RpcClient):
+    """
+    Answers the requests with the given responses keyed by path, recording them.
+    """
+
+    def __init__(self, responses):
+        super().__init__("http://localhost:8732")
+        self.responses = responses
+        self.paths = []
+
+    def get(self, path):
+        self.paths.append(path)
+        if path not in self.responses:
+            raise RpcError(f"{self.endpoint}/{path}: 404 Not Found")
+        return self.responses[path]
+
+
+def voting_info_path(address):
+    return f"chains/main/blocks/head/context/delegates/{address}/voting_info"
+
+
+class BatchVotingTest(unittest.TestCase):
+    def setUp(self):
+        wizard.get_key_address = lambda options, alias: keys.get(alias)
+        self.setup = wizard.Setup(config={"tezos_client_options": ""})
+
+    def plan(self, bakers, period, listings, voting_infos):
+        rpc = StubRpcClient(
+            {voting_info_path(a): info for a, info in voting_infos.items()}
+        )
+        state = {"period": period, "listings": listings}
+        report = self.setup.plan_batch_votes(bakers, state, rpc)
+        return {r["alias"]: r for r in report}, rpc.paths
+
+    def test_proposal_period(self):
+        wizard.parsed_args.proposals = [proposal_a, proposal_b]
+        report, paths = self.plan(
+            [("baker1", None), ("baker2", None), ("baker3", None), ("unknown", None)],
+            "proposal",
+            {"tz1baker1": 100, "tz1baker2": 100},
+            {
+                "tz1baker1": {
+                    "voting_power": "100",
+                    "current_proposals": [proposal_a],
+                    "remaining_proposals": 19,
+                },
+                "tz1baker2": {"voting_power": "100", "remaining_proposals": 20},
+            },
+        )
+        self.assertEqual(
+            sorted(paths),
+            [voting_info_path("tz1baker1"), voting_info_path("tz1baker2")],
+        )
+        self.assertEqual(report["baker1"]["proposals"], [proposal_b])
+        self.assertEqual(report["baker2"]["proposals"], [proposal_a, proposal_b])
+        self.assertTrue(report["baker1"]["submit"] and report["baker2"]["submit"])
+        self.assertEqual(report["baker3"]["details"], "not in the voting listings")
+        self.assertEqual(report["unknown"]["details"], "unknown alias")
+
+    def test_exploration_period(self):
+        report, _ = self.plan(
+            [("baker1", "yay"), ("baker2", "nay"), ("baker3", None)],
+            "exploration",
+            {"tz1baker1": 100, "tz1baker2": 100, "tz1baker3": 100},
+            {
+                "tz1baker1": {"voting_power": "100", "current_ballot": "yay"},
+                "tz1baker2": {"voting_power": "100"},
+                "tz1baker3": {"voting_power": "100"},
+            },
+        )
+        self.assertFalse(report["baker1"]["submit"])
+        self.assertEqual(report["baker1"]["details"], "already voted 'yay'")
+        self.assertTrue(report["baker2"]["submit"])
+        self.assertFalse(report["baker3"]["submit"])
+        self.assertEqual(report["baker3"]["details"], "no ballot given")
+
+    def test_no_listed_bakers(self):
+        report, paths = self.plan(
+            [("baker1", "yay"), ("unknown", "nay")], "promotion", {}, {}
+        )
+        self.assertEqual(paths, [])
+        self.assertTrue(all(r["status"] == "skipped" for r in report.values()))
+        self.assertEqual(report["baker1"]["details"], "not in the voting listings")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+#! /usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2024 Oxhead Alpha
+# SPDX-License-Identifier: LicenseRef-MIT-OA
+
+# This script checks the startup cost of the 'tezos-setup' and 'tezos-vote'
+# entry points.
+# Each entry point module is imported several times in a fresh interpreter
+# with '-X importtime', the median cumulative import time is compared
+# against '--threshold-ms', and the script fails if any module that should
+# only be loaded lazily (e.g. 'urllib.request') is imported at startup.
+#
+# Example:
+# ./tests/baking/import-time.py --threshold-ms 80
+
+import argparse, os, re, statistics, subprocess, sys
+
+entry_points = {
+    "tezos-setup": "tezos_baking.tezos_setup_wizard",
+    "tezos-vote": "tezos_baking.tezos_voting_wizard",
+}
+
+# These modules are only needed by some code paths of the wizards
+lazy_modules = [
+    "urllib.request",
+    "http.client",
+    "ssl",
+    "json",
+    "logging.handlers",
+    "readline",
+    "dataclasses",
+    "tezos_baking.provider",
+]
+
+baking_src = os.path.join(os.path.dirname(__file__), "..", "..", "baking", "src")
+
+
+def import_times(module):
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(baking_src))
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    times = {}
+    for line in stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)", line)
+        if match is not None:
+            times[match.group(2)] = int(match.group(1))
+    return times
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--threshold-ms", type=float, default=80)
+parser.add_argument("--runs", type=int, default=5)
+args = parser.parse_args()
+
+failed = False
+for name, module in entry_points.items():
+    runs = [import_times(module) for _ in range(args.runs)]
+    median_ms = statistics.median(run[module] for run in runs) / 1000
+    eager = [m for m in lazy_modules if m in runs[-1]]
+    status = "ok"
+    if median_ms > args.threshold_ms:
+        status = f"slower than {args.threshold_ms}ms"
+        failed = True
+    if eager:
+        status = f"imports {', '.join(eager)} at startup"
+        failed = True
+    print(f"{name}: {median_ms:.1f}ms ({status})")
+
+sys.exit(1 if failed else 0)
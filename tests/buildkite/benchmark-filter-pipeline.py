@@ -0,0 +1,163 @@
+#! /usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2024 Oxhead Alpha
+# SPDX-License-Identifier: LicenseRef-MIT-OA
+
+# This script benchmarks the pipeline filtering on synthetic pipelines and diffs.
+# The filtering done by '.buildkite/filter-pipeline.py' is compared with a reference
+# implementation that compiles and matches the regexes of every step separately and
+# walks the steps recursively, and the steps they trigger are checked to be the same.
+# The time to load and filter each pipeline file is also measured with and without
+# the cache of '--cache-dir'.
+#
+# Example:
+# ./tests/buildkite/benchmark-filter-pipeline.py --files 10000
+
+import argparse, copy, importlib.util, os, random, re, sys, tempfile, time
+
+from yaml import dump
+
+spec = importlib.util.spec_from_file_location(
+    "filter_pipeline",
+    os.path.join(
+        os.path.dirname(__file__), "..", "..", ".buildkite", "filter-pipeline.py"
+    ),
+)
+filter_pipeline = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(filter_pipeline)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--files", help="number of changed files", type=int, default=10000)
+parser.add_argument("--steps", help="number of steps", type=int, default=500)
+parser.add_argument(
+    "--depth",
+    help="length of the chain of dependent steps in the deep pipeline",
+    type=int,
+    default=2000,
+)
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+
+def naive_triggered_steps(steps, diff):
+    triggered = []
+    for step in steps:
+        regexes = step.pop("only_changes", None)
+        if regexes is None or any(
+            re.compile(regex).match(diff_file) is not None
+            for regex in regexes
+            for diff_file in diff
+        ):
+            triggered.append(step["label"])
+
+    def dfs(name, depends_on_dict, visited):
+        if name not in visited:
+            visited.add(name)
+            for adjacent in depends_on_dict.get(name, []):
+                dfs(adjacent, depends_on_dict, visited)
+
+    key_to_label = filter_pipeline.build_key_to_label(steps)
+    depends_on_dict, depends_on_dict_rev = filter_pipeline.build_tree(
+        steps, key_to_label
+    )
+    visited, visited_rev = set(), set()
+    for label in triggered:
+        dfs(label, depends_on_dict, visited)
+        dfs(label, depends_on_dict_rev, visited_rev)
+    for name in visited:
+        dfs(name, depends_on_dict_rev, visited_rev)
+    return visited | visited_rev
+
+
+def synthetic_pipeline(rng, steps_count, chain):
+    """
+    Steps watching the files of some directories, each one depending on the previous
+    one if 'chain' is set, or on a few random earlier ones otherwise.
+    """
+    steps = []
+    for i in range(steps_count):
+        step = {
+            "label": f"step {i}",
+            "key": f"step-{i}",
+            "only_changes": [
+                rng.choice(
+                    [
+                        f"dir{rng.randrange(50)}/sub{rng.randrange(20)}/.*",
+                        f"dir{rng.randrange(50)}/.*\\.nix",
+                        f"dir{rng.randrange(50)}/sub{rng.randrange(20)}/file{rng.randrange(100)}\\.py",
+                    ]
+                )
+                for _ in range(rng.randrange(1, 4))
+            ],
+        }
+        if chain and i > 0:
+            step["depends_on"] = f"step-{i - 1}"
+        elif i > 0 and rng.random() < 0.5:
+            step["depends_on"] = [
+                f"step-{j}" for j in set(rng.choices(range(i), k=rng.randrange(1, 3)))
+            ]
+        steps.append(step)
+    return steps
+
+
+def synthetic_diff(rng, files_count):
+    # most of the changes are in directories no step watches
+    return [
+        f"{rng.choice(['dir', 'other'] + ['vendor'] * 3)}{rng.randrange(200)}"
+        f"/sub{rng.randrange(20)}/file{rng.randrange(1000)}.{rng.choice(['py', 'nix', 'md'])}"
+        for _ in range(files_count)
+    ]
+
+
+def timed(f, steps, diff):
+    steps = copy.deepcopy(steps)
+    start = time.monotonic()
+    try:
+        result = f(steps, diff)
+    except RecursionError:
+        return None, time.monotonic() - start
+    return result, time.monotonic() - start
+
+
+rng = random.Random(args.seed)
+diff = synthetic_diff(rng, args.files)
+scenarios = {
+    "wide": synthetic_pipeline(rng, args.steps, chain=False),
+    "deep": synthetic_pipeline(rng, args.depth, chain=True),
+}
+
+failed = False
+print(f"{len(diff)} changed files")
+for name, steps in scenarios.items():
+    expected, naive_time = timed(naive_triggered_steps, steps, diff)
+    result, time_taken = timed(filter_pipeline.triggered_steps, steps, diff)
+    naive = "recursion limit" if expected is None else f"{naive_time:.3f}s"
+    print(
+        f"{name}: {len(steps)} steps, {len(result)} triggered, "
+        f"reference {naive}, filter-pipeline.py {time_taken:.3f}s"
+    )
+    if expected is not None and expected != result:
+        print(f"{name}: the triggered steps differ from the reference ones")
+        failed = True
+
+
+def timed_load(pipeline_path, cache_dir):
+    start = time.monotonic()
+    prepared = filter_pipeline.load_prepared_pipeline(pipeline_path, cache_dir)
+    filter_pipeline.filter_prepared_pipeline(prepared, diff)
+    return time.monotonic() - start
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    for name, steps in scenarios.items():
+        pipeline_path = os.path.join(tmp, f"{name}.yml")
+        with open(pipeline_path, "w") as f:
+            dump({"steps": steps}, f)
+        uncached = timed_load(pipeline_path, None)
+        # the first run fills the cache
+        timed_load(pipeline_path, tmp)
+        cached = timed_load(pipeline_path, tmp)
+        print(f"{name}: load and filter {uncached:.3f}s, cached {cached:.3f}s")
+
+if failed:
+    sys.exit(1)
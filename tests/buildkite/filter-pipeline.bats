@@ -29,6 +29,33 @@ function setup() {
   diff tests/buildkite/pipeline.yml tests/buildkite/golden/pipeline-X.yml
 }
 
+@test "explain why steps run" {
+  "$filter_script" --pipeline "$src" --git-diff "C" --output tests/buildkite/pipeline.yml \
+    --explain > tests/buildkite/explain.txt
+  diff tests/buildkite/explain.txt tests/buildkite/golden/explain-C.txt
+  rm tests/buildkite/explain.txt
+}
+
+@test "explain the same way whatever the hash seed" {
+  for seed in 0 1 2 3 4 5 6 7; do
+    PYTHONHASHSEED="$seed" "$filter_script" --pipeline "$src" --git-diff "C" \
+      --output tests/buildkite/pipeline.yml --explain > tests/buildkite/explain.txt
+    diff tests/buildkite/explain.txt tests/buildkite/golden/explain-C.txt
+  done
+  rm tests/buildkite/explain.txt
+}
+
+@test "reuse the cached pipeline" {
+  cache_dir="$(mktemp -d)"
+  for diff in A C G; do
+    "$filter_script" --pipeline "$src" --git-diff "$diff" --output tests/buildkite/pipeline.yml \
+      --cache-dir "$cache_dir"
+    diff tests/buildkite/pipeline.yml "tests/buildkite/golden/pipeline-$diff.yml"
+  done
+  [ "$(ls "$cache_dir" | wc -l)" -eq 1 ]
+  rm -r "$cache_dir"
+}
+
 function teardown() {
   rm tests/buildkite/pipeline.yml
 }
@@ -0,0 +1,54 @@
+
+%define debug_package %{nil}
+Name:    tezos-codec
+Version: 0.0
+Release: 1
+Epoch: 1
+Summary: A client to decode and encode JSON
+License: MIT
+BuildArch: x86_64 aarch64
+Source0: tezos-codec-0.0.tar.gz
+Source1: https://gitlab.com/tezos/tezos/tree/v0.0/
+BuildRequires: make wget systemd systemd-rpm-macros
+Requires: , 
+%description
+A client to decode and encode JSON
+Maintainer: Serokell <hi@serokell.io>
+%prep
+%setup -q
+%build
+%install
+make octez-codec
+mkdir -p %{buildroot}/%{_bindir}
+install -m 0755 octez-codec %{buildroot}/%{_bindir}
+ln -s %{_bindir}/octez-codec %{buildroot}/%{_bindir}/tezos-codec
+
+
+
+mkdir -p %{buildroot}/%{_unitdir}
+
+
+
+
+%files
+%license LICENSE
+
+%{_bindir}/octez-codec
+%{_bindir}/tezos-codec
+
+
+
+
+
+
+%post
+
+
+
+%preun
+
+
+%postun
+
+
+
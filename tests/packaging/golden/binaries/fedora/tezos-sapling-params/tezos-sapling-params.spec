@@ -0,0 +1,26 @@
+
+%define debug_package %{nil}
+Name:    tezos-sapling-params
+Version: 0.0
+Release: 1
+Epoch: 1
+Summary: Sapling params required in the runtime by the Tezos binaries
+License: MIT
+BuildArch: x86_64 aarch64
+Source0: tezos-sapling-params-0.0.tar.gz
+BuildRequires: wget
+%description
+Sapling params required in the runtime by the Tezos binaries
+Maintainer: Serokell <hi@serokell.io>
+%prep
+%setup -q
+%build
+%install
+mkdir -p %{buildroot}/%{_datadir}/zcash-params
+install -m 0755 sapling-spend.params %{buildroot}/%{_datadir}/zcash-params
+install -m 0755 sapling-output.params %{buildroot}/%{_datadir}/zcash-params
+
+%files
+%license LICENSE
+%{_datadir}/zcash-params/sapling-spend.params
+%{_datadir}/zcash-params/sapling-output.params
@@ -0,0 +1,54 @@
+
+%define debug_package %{nil}
+Name:    tezos-admin-client
+Version: 0.0
+Release: 1
+Epoch: 1
+Summary: Administration tool for the node
+License: MIT
+BuildArch: x86_64 aarch64
+Source0: tezos-admin-client-0.0.tar.gz
+Source1: https://gitlab.com/tezos/tezos/tree/v0.0/
+BuildRequires: make cmake m4 perl pkg-config wget unzip rsync cargo gcc opam git autoconf coreutils openssl-devel libev-devel gmp-devel hidapi-devel libffi-devel zlib-devel libpq-devel protobuf-compiler protobuf-devel sqlite-devel systemd systemd-rpm-macros
+Requires: openssl-devel libev-devel gmp-devel hidapi-devel libffi-devel zlib-devel libpq-devel protobuf-compiler protobuf-devel sqlite-devel, 
+%description
+Administration tool for the node
+Maintainer: Serokell <hi@serokell.io>
+%prep
+%setup -q
+%build
+%install
+make octez-admin-client
+mkdir -p %{buildroot}/%{_bindir}
+install -m 0755 octez-admin-client %{buildroot}/%{_bindir}
+ln -s %{_bindir}/octez-admin-client %{buildroot}/%{_bindir}/tezos-admin-client
+
+
+
+mkdir -p %{buildroot}/%{_unitdir}
+
+
+
+
+%files
+%license LICENSE
+
+%{_bindir}/octez-admin-client
+%{_bindir}/tezos-admin-client
+
+
+
+
+
+
+%post
+
+
+
+%preun
+
+
+%postun
+
+
+
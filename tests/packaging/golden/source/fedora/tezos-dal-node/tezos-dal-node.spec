@@ -0,0 +1,54 @@
+
+%define debug_package %{nil}
+Name:    tezos-dal-node
+Version: 0.0
+Release: 1
+Epoch: 1
+Summary: A Data Availability Layer Tezos node
+License: MIT
+BuildArch: x86_64 aarch64
+Source0: tezos-dal-node-0.0.tar.gz
+Source1: https://gitlab.com/tezos/tezos/tree/v0.0/
+BuildRequires: make cmake m4 perl pkg-config wget unzip rsync cargo gcc opam git autoconf coreutils openssl-devel libev-devel gmp-devel hidapi-devel libffi-devel zlib-devel libpq-devel protobuf-compiler protobuf-devel sqlite-devel systemd systemd-rpm-macros
+Requires: openssl-devel libev-devel gmp-devel hidapi-devel libffi-devel zlib-devel libpq-devel protobuf-compiler protobuf-devel sqlite-devel, 
+%description
+A Data Availability Layer Tezos node
+Maintainer: Serokell <hi@serokell.io>
+%prep
+%setup -q
+%build
+%install
+make octez-dal-node
+mkdir -p %{buildroot}/%{_bindir}
+install -m 0755 octez-dal-node %{buildroot}/%{_bindir}
+ln -s %{_bindir}/octez-dal-node %{buildroot}/%{_bindir}/tezos-dal-node
+
+
+
+mkdir -p %{buildroot}/%{_unitdir}
+
+
+
+
+%files
+%license LICENSE
+
+%{_bindir}/octez-dal-node
+%{_bindir}/tezos-dal-node
+
+
+
+
+
+
+%post
+
+
+
+%preun
+
+
+%postun
+
+
+
@@ -0,0 +1,54 @@
+
+%define debug_package %{nil}
+Name:    tezos-smart-rollup-wasm-debugger
+Version: 0.0
+Release: 1
+Epoch: 1
+Summary: Smart contract rollup wasm debugger
+License: MIT
+BuildArch: x86_64 aarch64
+Source0: tezos-smart-rollup-wasm-debugger-0.0.tar.gz
+Source1: https://gitlab.com/tezos/tezos/tree/v0.0/
+BuildRequires: make cmake m4 perl pkg-config wget unzip rsync cargo gcc opam git autoconf coreutils openssl-devel libev-devel gmp-devel hidapi-devel libffi-devel zlib-devel libpq-devel protobuf-compiler protobuf-devel sqlite-devel systemd systemd-rpm-macros
+Requires: openssl-devel libev-devel gmp-devel hidapi-devel libffi-devel zlib-devel libpq-devel protobuf-compiler protobuf-devel sqlite-devel, 
+%description
+Smart contract rollup wasm debugger
+Maintainer: Serokell <hi@serokell.io>
+%prep
+%setup -q
+%build
+%install
+make octez-smart-rollup-wasm-debugger
+mkdir -p %{buildroot}/%{_bindir}
+install -m 0755 octez-smart-rollup-wasm-debugger %{buildroot}/%{_bindir}
+ln -s %{_bindir}/octez-smart-rollup-wasm-debugger %{buildroot}/%{_bindir}/tezos-smart-rollup-wasm-debugger
+
+
+
+mkdir -p %{buildroot}/%{_unitdir}
+
+
+
+
+%files
+%license LICENSE
+
+%{_bindir}/octez-smart-rollup-wasm-debugger
+%{_bindir}/tezos-smart-rollup-wasm-debugger
+
+
+
+
+
+
+%post
+
+
+
+%preun
+
+
+%postun
+
+
+